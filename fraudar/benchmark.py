@@ -0,0 +1,364 @@
+#
+#  benchmark.py
+#
+#  Copyright (c) 2016-2025 Junpei Kawamoto
+#
+#  This file is part of rgmining-fraudar.
+#
+#  rgmining-fraudar is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  rgmining-fraudar is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with rgmining-fraudar. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Benchmark detection on synthetic graphs with injected dense blocks.
+
+Run it from the command line and compare the JSON outputs of two runs::
+
+    $ python -m fraudar.benchmark --edges 10000 1000000 --engine compiled \\
+        --output result.json
+
+Each case generates a bipartite graph whose reviewer and product degrees
+follow power laws, injects a camouflaged dense block, and measures
+:meth:`ReviewGraph.update <fraudar.graph.ReviewGraph.update>`,
+:meth:`detectMultiple <fraudar.export.greedy.detectMultiple>` with each
+weighting function, the time of each phase reported by
+:mod:`fraudar.instrument`, throughput, peak RSS, and the F-measure of the
+detected block. Cases run in fresh worker processes so that peak RSS is
+measured per case.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+from collections import defaultdict
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Final, Literal, NamedTuple, TextIO, TypeAlias
+
+import numpy as np
+from numpy.typing import NDArray
+
+from fraudar import instrument
+from fraudar.export import greedy
+from fraudar.export.jit import HAVE_NUMBA
+from fraudar.graph import ReviewGraph
+
+ALGORITHMS: Final = {
+    "aveDegree": greedy.aveDegree,
+    "sqrtWeightedAveDegree": greedy.sqrtWeightedAveDegree,
+    "logWeightedAveDegree": greedy.logWeightedAveDegree,
+}
+"""Algorithms measured in each case."""
+
+Camouflage: TypeAlias = Literal["none", "random", "biased"]
+"""Kind of camouflage edges added by fraudulent reviewers."""
+
+
+class SyntheticGraph(NamedTuple):
+    """Edges of a synthetic graph and its injected block."""
+
+    reviewers: NDArray[np.int64]
+    """Reviewer IDs of the edges."""
+    products: NDArray[np.int64]
+    """Product IDs of the edges."""
+    shape: tuple[int, int]
+    """The numbers of reviewers and products."""
+    block: tuple[set[int], set[int]]
+    """Reviewer and product IDs of the injected block."""
+
+
+def generate(
+    num_edges: int,
+    seed: int | None = None,
+    block_size: int | None = None,
+    density: float = 0.5,
+    camouflage: Camouflage = "random",
+) -> SyntheticGraph:
+    """Generate a power-law bipartite graph with an injected dense block.
+
+    Endpoints of background edges are drawn by inverse transform sampling,
+    so that node degrees decrease polynomially with node IDs. Each
+    fraudulent reviewer also reviews about as many other products as
+    products in the block, chosen uniformly with random camouflage and in
+    proportion to degrees with biased camouflage.
+
+    Args:
+      num_edges: the number of background edges.
+      seed: seed of the random generator. (default: None)
+      block_size: the number of reviewers and products in the block.
+        (default: about a tenth of the square root of num_edges)
+      density: edge density of the block. (default: 0.5)
+      camouflage: kind of camouflage edges. (default: random)
+
+    Returns:
+      the generated graph.
+    """
+    rng = np.random.default_rng(seed)
+    m = max(num_edges // 10, 1)
+    n = max(num_edges // 20, 1)
+    if block_size is None:
+        block_size = max(int(np.sqrt(num_edges)) // 10, 10)
+    block_size = min(block_size, m, n)
+
+    reviewers = _power_law(rng, m, num_edges)
+    products = _power_law(rng, n, num_edges)
+
+    block_rows = rng.choice(m, block_size, replace=False)
+    block_cols = rng.choice(n, block_size, replace=False)
+    mask = rng.random((block_size, block_size)) < density
+    fraud_rows, fraud_cols = np.nonzero(mask)
+    edges = [
+        (reviewers, products),
+        (block_rows[fraud_rows], block_cols[fraud_cols]),
+    ]
+
+    if camouflage != "none":
+        per_reviewer = rng.binomial(block_size, density, block_size)
+        camo_rows = np.repeat(block_rows, per_reviewer)
+        if camouflage == "random":
+            camo_cols = rng.integers(0, n, len(camo_rows))
+        else:
+            camo_cols = products[rng.integers(0, num_edges, len(camo_rows))]
+        edges.append((camo_rows, camo_cols))
+
+    return SyntheticGraph(
+        np.concatenate([r for r, _ in edges]),
+        np.concatenate([c for _, c in edges]),
+        (m, n),
+        (set(block_rows.tolist()), set(block_cols.tolist())),
+    )
+
+
+def _power_law(
+    rng: np.random.Generator, size: int, samples: int, gamma: float = 2.0
+) -> NDArray[np.int64]:
+    """Draw node IDs whose frequencies follow a power law.
+
+    Args:
+      rng: random generator.
+      size: the number of nodes.
+      samples: the number of IDs to be drawn.
+      gamma: skewness; the probability of ID k is proportional to
+        k ** (1 / gamma - 1).
+
+    Returns:
+      the drawn IDs.
+    """
+    res: NDArray[np.int64] = (size * rng.random(samples) ** gamma).astype(
+        np.int64
+    )
+    return res
+
+
+def run_case(
+    num_edges: int,
+    engine: str,
+    blocks: int = 1,
+    seed: int | None = 0,
+    camouflage: Camouflage = "random",
+) -> dict[str, Any]:
+    """Run a benchmark case.
+
+    Args:
+      num_edges: the number of background edges.
+      engine: engine of the greedy algorithm, i.e. compiled, python, or
+        batch.
+      blocks: the number of blocks to be detected. (default: 1)
+      seed: seed of the random generator. (default: 0)
+      camouflage: kind of camouflage edges. (default: random)
+
+    Returns:
+      measurements of the case.
+    """
+    start = time.perf_counter()
+    g = generate(num_edges, seed, camouflage=camouflage)
+    res: dict[str, Any] = {
+        "edges": len(g.reviewers),
+        "shape": list(g.shape),
+        "engine": engine,
+        "blocks": blocks,
+        "camouflage": camouflage,
+        "generate_seconds": time.perf_counter() - start,
+    }
+
+    # load or compile the kernels before measuring.
+    warm_up = generate(100, seed)
+    for algo in ALGORITHMS.values():
+        algo(
+            greedy.listToSparseMatrix(warm_up.reviewers, warm_up.products),
+            engine=engine,
+        )
+
+    start = time.perf_counter()
+    M = greedy.listToSparseMatrix(g.reviewers, g.products, g.shape)
+    res["build_matrix_seconds"] = time.perf_counter() - start
+    res["nnz"] = int(M.nnz)
+
+    algorithms = {}
+    for name, algo in ALGORITHMS.items():
+        with instrument.collect() as records:
+            start = time.perf_counter()
+            detected = greedy.detectMultiple(
+                M, partial(algo, engine=engine), blocks
+            )
+            seconds = time.perf_counter() - start
+        algorithms[name] = {
+            "seconds": seconds,
+            "edges_per_second": M.nnz * blocks / seconds,
+            "f_measure": greedy.getFMeasure(detected[0][0], g.block),
+            "score": detected[0][1],
+            "phases": _phase_summary(records),
+        }
+    res["detect_multiple"] = algorithms
+
+    graph = ReviewGraph.from_edges(
+        g.reviewers,
+        g.products,
+        np.ones(len(g.reviewers)),
+        blocks=blocks,
+        algo=partial(greedy.logWeightedAveDegree, engine=engine),
+    )
+    with instrument.collect() as records:
+        start = time.perf_counter()
+        graph.update()
+        seconds = time.perf_counter() - start
+    res["update"] = {
+        "seconds": seconds,
+        "edges_per_second": len(g.reviewers) / seconds,
+        "phases": _phase_summary(records),
+    }
+    res["peak_rss"] = _peak_rss()
+    return res
+
+
+def _phase_summary(
+    records: Sequence[instrument.PhaseRecord],
+) -> dict[str, dict[str, float]]:
+    """Summarize phase records by their names.
+
+    Args:
+      records: records of finished phases.
+
+    Returns:
+      total seconds and, if counted, items per second of each phase.
+    """
+    seconds: defaultdict[str, float] = defaultdict(float)
+    items: defaultdict[str, int] = defaultdict(int)
+    for r in records:
+        seconds[r.name] += r.seconds
+        if r.items is not None:
+            items[r.name] += r.items
+    res = {}
+    for name, s in seconds.items():
+        res[name] = {"seconds": s}
+        if name in items and s > 0:
+            res[name]["items_per_second"] = items[name] / s
+    return res
+
+
+def _peak_rss() -> int | None:
+    """Return the peak resident set size of this process in bytes.
+
+    Returns:
+      the peak RSS, or None if the platform doesn't report it.
+    """
+    try:
+        import resource
+    except ImportError:  # pragma: no cover
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes and macOS reports bytes.
+    return int(rss if sys.platform == "darwin" else rss * 1024)
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    """Run benchmark cases given by command line arguments.
+
+    Args:
+      argv: command line arguments. (default: sys.argv)
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m fraudar.benchmark", description=__doc__.split("\n")[0]
+    )
+    parser.add_argument(
+        "--edges",
+        type=lambda s: int(float(s)),
+        nargs="+",
+        default=[10**4, 10**5, 10**6],
+        help="numbers of background edges, e.g. 1e4 1e8",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["compiled", "python", "batch"],
+        nargs="+",
+        default=["compiled" if HAVE_NUMBA else "python"],
+    )
+    parser.add_argument("--blocks", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--camouflage",
+        choices=["none", "random", "biased"],
+        default="random",
+    )
+    parser.add_argument(
+        "--no-isolate",
+        dest="isolate",
+        action="store_false",
+        help="run cases in this process; peak RSS is then cumulative",
+    )
+    parser.add_argument(
+        "--output", default="-", help="output file; - means stdout"
+    )
+    args = parser.parse_args(argv)
+
+    cases = [
+        (e, engine, args.blocks, args.seed, args.camouflage)
+        for e in args.edges
+        for engine in args.engine
+    ]
+    results = []
+    for case in cases:
+        if args.isolate:
+            with ProcessPoolExecutor(1) as pool:
+                results.append(pool.submit(run_case, *case).result())
+        else:
+            results.append(run_case(*case))
+
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "numba": HAVE_NUMBA,
+        "cases": results,
+    }
+    if args.output == "-":
+        _write_report(report, sys.stdout)
+    else:
+        with open(args.output, "w", encoding="utf-8") as fp:
+            _write_report(report, fp)
+
+
+def _write_report(report: dict[str, Any], fp: TextIO) -> None:
+    """Write a report as JSON.
+
+    Args:
+      report: the report.
+      fp: file-like object where the report is written.
+    """
+    json.dump(report, fp, indent=2)
+    fp.write("\n")
+    fp.flush()
+
+
+if __name__ == "__main__":
+    main()
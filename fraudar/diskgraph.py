@@ -0,0 +1,217 @@
+#
+#  diskgraph.py
+#
+#  Copyright (c) 2016-2025 Junpei Kawamoto
+#
+#  This file is part of rgmining-fraudar.
+#
+#  rgmining-fraudar is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  rgmining-fraudar is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with rgmining-fraudar. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Provide a memory-mapped on-disk graph format.
+
+A graph is stored in a directory which has the CSR and CSC forms of the
+adjacency matrix and the reviewer and product name tables as ``.npy`` files.
+:class:`DiskGraph` opens them with :func:`numpy.memmap`, and
+:meth:`detectMultiple <fraudar.export.greedy.detectMultiple>` and the
+weighting functions of :mod:`fraudar.export.greedy` accept it in place of a
+sparse matrix. With the compiled engine, detection then needs memory only
+for the degree arrays and the priority structures.
+"""
+
+import json
+import os
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any, Final, Literal
+
+import numpy as np
+from numpy.typing import NDArray
+from scipy import sparse
+
+FORMAT_VERSION: Final = 1
+"""Version of the on-disk format."""
+
+_META: Final = "meta.json"
+_ARRAYS: Final = ("indptr", "indices", "data")
+
+
+class DiskGraph:
+    """A graph stored in a directory, opened as memory-mapped arrays.
+
+    Use :meth:`write` to create the directory.
+
+    Args:
+      path: path to the directory.
+    """
+
+    path: Final[Path]
+    """Path to the directory."""
+    shape: Final[tuple[int, int]]
+    """Shape of the adjacency matrix, i.e. the numbers of reviewers and
+    products."""
+    csr: Final[sparse.csr_matrix]
+    """Adjacency matrix in CSR format, backed by memory-mapped arrays."""
+    csc: Final[sparse.csc_matrix]
+    """Adjacency matrix in CSC format, backed by memory-mapped arrays."""
+
+    def __init__(
+        self, path: str | os.PathLike[str], _data_mode: Literal["r", "c"] = "r"
+    ) -> None:
+        self.path = Path(path)
+        with open(self.path / _META) as fp:
+            meta = json.load(fp)
+        if meta["version"] != FORMAT_VERSION:
+            raise ValueError(f"unsupported format version: {meta['version']}")
+        self.shape = (int(meta["shape"][0]), int(meta["shape"][1]))
+        self.csr = sparse.csr_matrix(
+            self._load("csr", _data_mode), shape=self.shape, copy=False
+        )
+        self.csc = sparse.csc_matrix(
+            self._load("csc", _data_mode), shape=self.shape, copy=False
+        )
+
+    def _load(
+        self, fmt: str, data_mode: Literal["r", "c"]
+    ) -> tuple[NDArray[Any], NDArray[Any], NDArray[Any]]:
+        indptr, indices, data = (
+            np.load(
+                self.path / f"{fmt}_{name}.npy",
+                mmap_mode=data_mode if name == "data" else "r",
+            )
+            for name in _ARRAYS
+        )
+        return data, indices, indptr
+
+    def residual(self) -> "DiskGraph":
+        """Open this graph again with copy-on-write data arrays.
+
+        Edges removed from the returned graph are zeroed in memory, and
+        the files are not modified.
+
+        Returns:
+          a new graph object sharing the files.
+        """
+        return DiskGraph(self.path, "c")
+
+    def reviewer_name(self, i: int) -> str:
+        """Returns the name of a reviewer.
+
+        Args:
+          i: row index of the reviewer.
+        """
+        return _name(self.path, "reviewers", i)
+
+    def product_name(self, j: int) -> str:
+        """Returns the name of a product.
+
+        Args:
+          j: column index of the product.
+        """
+        return _name(self.path, "products", j)
+
+    @classmethod
+    def write(
+        cls,
+        path: str | os.PathLike[str],
+        M: sparse.spmatrix,
+        reviewers: Sequence[str] | NDArray[np.str_] | None = None,
+        products: Sequence[str] | NDArray[np.str_] | None = None,
+    ) -> "DiskGraph":
+        """Write a graph to a directory.
+
+        Indices are stored as 32-bit integers when they fit, so that scipy
+        uses the memory-mapped arrays without converting them.
+
+        Args:
+          path: path to the directory, which is created if it doesn't exist.
+          M: adjacency matrix where rows are reviewers and columns are
+            products.
+          reviewers: names of the reviewers. (default: row indices)
+          products: names of the products. (default: column indices)
+
+        Returns:
+          the written graph opened from the directory.
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        m, n = M.shape
+        idx_dtype = (
+            np.int32
+            if max(m, n, M.nnz) <= np.iinfo(np.int32).max
+            else np.int64
+        )
+        for fmt, mat in (("csr", M.tocsr()), ("csc", M.tocsc())):
+            if not mat.has_canonical_format:
+                # tocsr and tocsc may return M itself, which must not change.
+                mat = mat.copy()
+                mat.sum_duplicates()
+            for name, a in zip(
+                _ARRAYS,
+                (
+                    mat.indptr.astype(idx_dtype),
+                    mat.indices.astype(idx_dtype),
+                    mat.data.astype(np.float64),
+                ),
+                strict=True,
+            ):
+                np.save(path / f"{fmt}_{name}.npy", a)
+
+        if reviewers is None:
+            reviewers = [str(i) for i in range(m)]
+        if products is None:
+            products = [str(j) for j in range(n)]
+        _write_names(path, "reviewers", reviewers)
+        _write_names(path, "products", products)
+        with open(path / _META, "w") as fp:
+            json.dump(
+                {"version": FORMAT_VERSION, "shape": [m, n], "edges": M.nnz},
+                fp,
+            )
+        return cls(path)
+
+
+def _write_names(
+    path: Path, table: str, names: Sequence[str] | NDArray[np.str_]
+) -> None:
+    """Write a name table as UTF-8 bytes and their offsets.
+
+    Args:
+      path: path to the directory.
+      table: name of the table.
+      names: names to be written.
+    """
+    encoded = [s.encode() for s in names]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    np.save(path / f"{table}_offsets.npy", offsets)
+    np.save(
+        path / f"{table}_names.npy",
+        np.frombuffer(b"".join(encoded), dtype=np.uint8),
+    )
+
+
+def _name(path: Path, table: str, i: int) -> str:
+    """Read a name from a name table.
+
+    Args:
+      path: path to the directory.
+      table: name of the table.
+      i: index of the name.
+
+    Returns:
+      the name.
+    """
+    offsets = np.load(path / f"{table}_offsets.npy", mmap_mode="r")
+    names = np.load(path / f"{table}_names.npy", mmap_mode="r")
+    return bytes(names[offsets[i] : offsets[i + 1]]).decode()
@@ -22,8 +22,13 @@
 #  and distributed under Apache License, Version 2.0.
 #
 # mypy: ignore-errors
+import heapq
 import math
 
+import numpy as np
+
+from .jit import HAVE_NUMBA, njit
+
 
 class MinTree:
     """
@@ -66,6 +71,11 @@ class MinTree:
                 break
             self.nodes[cur] = nextParent
 
+    # change the values of many leaves, one by one
+    def changeVals(self, indices, deltas):
+        for idx, delta in zip(indices, deltas):
+            self.changeVal(idx, delta)
+
     def dump(self):
         print(
             f"numLeaves: {self.numLeaves}, numBranches: {self.numBranches}, n: {self.n}, nodes: "
@@ -76,3 +86,190 @@ class MinTree:
                 print(self.nodes[cur], end=" ")
                 cur += 1
             print("")
+
+
+class ArrayMinTree:
+    """
+    A MinTree stored in a contiguous float64 NumPy array. getMin and changeVal are compiled with numba
+    if it is installed, and changeVals updates many leaves at once and fixes up their shared ancestors
+    only once. It can be used in place of MinTree.
+    """
+
+    def __init__(self, degrees):
+        self.height = int(math.ceil(math.log(len(degrees), 2)))
+        self.numLeaves = 2**self.height
+        self.numBranches = self.numLeaves - 1
+        self.n = self.numBranches + self.numLeaves
+        self.nodes = _treeBuild(
+            np.asarray(degrees, dtype=np.float64), self.height
+        )
+
+    def getMin(self):
+        cur = _treeGetMin(self.nodes, self.height)
+        return (cur - self.numBranches, float(self.nodes[cur]))
+
+    def changeVal(self, idx, delta):
+        _treeChangeVal(self.nodes, self.height, self.numBranches + idx, delta)
+
+    # indices must not contain duplicates
+    def changeVals(self, indices, deltas):
+        leaves = self.numBranches + np.asarray(indices, dtype=np.int64)
+        deltas = np.broadcast_to(
+            np.asarray(deltas, dtype=np.float64), leaves.shape
+        )
+        _treeChangeVals(self.nodes, self.height, leaves, deltas)
+
+    def dump(self):
+        MinTree.dump(self)
+
+
+class BucketQueue:
+    """
+    A priority structure for integer degrees which only decrease, as in k-core peeling. Each degree has
+    a bucket of indices, and getMin scans buckets upward from the smallest possible degree, dropping
+    stale entries lazily. Ties are broken by the smallest index, as in MinTree. Setting a degree to
+    infinity removes the element.
+    """
+
+    def __init__(self, degrees):
+        self.degrees = [int(d) for d in degrees]
+        self.buckets = [[] for _ in range(max(self.degrees, default=0) + 1)]
+        for i, d in enumerate(self.degrees):
+            # indices are appended in ascending order, so each bucket is a heap
+            self.buckets[d].append(i)
+        self.cur = 0
+
+    def getMin(self):
+        while self.cur < len(self.buckets):
+            bucket = self.buckets[self.cur]
+            while bucket:
+                i = bucket[0]
+                if self.degrees[i] == self.cur:
+                    return (i, float(self.cur))
+                heapq.heappop(bucket)
+            self.cur += 1
+        return (-1, float("inf"))
+
+    def changeVal(self, idx, delta):
+        d = self.degrees[idx]
+        if d is None:
+            return
+        if delta == float("inf"):
+            self.degrees[idx] = None
+            return
+        d += int(delta)
+        self.degrees[idx] = d
+        heapq.heappush(self.buckets[d], idx)
+        if d < self.cur:
+            self.cur = d
+
+    def changeVals(self, indices, deltas):
+        for idx, delta in zip(indices, deltas):
+            self.changeVal(idx, delta)
+
+
+class LazyHeap:
+    """
+    A priority structure backed by a binary heap of (degree, index) pairs. Changing a degree pushes a new
+    pair and leaves the old one in the heap; getMin discards pairs which no longer match the current
+    degree. The heap is rebuilt when stale pairs outnumber the live elements. Ties are broken by the
+    smallest index, as in MinTree. Setting a degree to infinity removes the element.
+    """
+
+    def __init__(self, degrees):
+        self.degrees = [float(d) for d in degrees]
+        self.numLive = len(self.degrees)
+        self._rebuild()
+
+    def _rebuild(self):
+        self.heap = [
+            (d, i) for i, d in enumerate(self.degrees) if d != float("inf")
+        ]
+        heapq.heapify(self.heap)
+
+    def getMin(self):
+        while self.heap:
+            (d, i) = self.heap[0]
+            if self.degrees[i] == d:
+                return (i, d)
+            heapq.heappop(self.heap)
+        return (-1, float("inf"))
+
+    def changeVal(self, idx, delta):
+        d = self.degrees[idx]
+        if d == float("inf"):
+            return
+        d += delta
+        self.degrees[idx] = d
+        if d == float("inf"):
+            self.numLive -= 1
+        else:
+            heapq.heappush(self.heap, (d, idx))
+        if len(self.heap) > 2 * self.numLive + 64:
+            self._rebuild()
+
+    def changeVals(self, indices, deltas):
+        for idx, delta in zip(indices, deltas):
+            self.changeVal(idx, delta)
+
+
+# returns the nodes of a tree of the given height whose leaves are degrees
+@njit(cache=True)
+def _treeBuild(degrees, height):
+    numBranches = 2**height - 1
+    nodes = np.full(2 * numBranches + 1, np.inf)
+    nodes[numBranches : numBranches + len(degrees)] = degrees
+    for i in range(numBranches - 1, -1, -1):
+        nodes[i] = min(nodes[2 * i + 1], nodes[2 * i + 2])
+    return nodes
+
+
+@njit(cache=True)
+def _treeGetMin(nodes, height):
+    cur = 0
+    for _ in range(height):
+        left = 2 * cur + 1
+        cur = left if nodes[left] <= nodes[left + 1] else left + 1
+    return cur
+
+
+@njit(cache=True)
+def _treeChangeVal(nodes, height, cur, delta):
+    nodes[cur] += delta
+    for _ in range(height):
+        cur = (cur - 1) // 2
+        nextParent = min(nodes[2 * cur + 1], nodes[2 * cur + 2])
+        if nodes[cur] == nextParent:
+            break
+        nodes[cur] = nextParent
+
+
+if HAVE_NUMBA:
+
+    @njit(cache=True)
+    def _treeChangeVals(nodes, height, leaves, deltas):
+        k = len(leaves)
+        for t in range(k):
+            nodes[leaves[t]] += deltas[t]
+        cur = np.sort(leaves)
+        # parents of sorted nodes are sorted, so duplicates are adjacent
+        for _ in range(height):
+            size = 0
+            for t in range(k):
+                p = (cur[t] - 1) // 2
+                if size == 0 or cur[size - 1] != p:
+                    cur[size] = p
+                    size += 1
+            k = size
+            for t in range(k):
+                p = cur[t]
+                nodes[p] = min(nodes[2 * p + 1], nodes[2 * p + 2])
+
+else:  # pragma: no cover
+
+    def _treeChangeVals(nodes, height, leaves, deltas):
+        nodes[leaves] += deltas
+        cur = np.unique(leaves)
+        for _ in range(height):
+            cur = np.unique((cur - 1) // 2)
+            nodes[cur] = np.minimum(nodes[2 * cur + 1], nodes[2 * cur + 2])
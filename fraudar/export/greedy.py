@@ -26,55 +26,345 @@
 This module contains functions that run the greedy detector for dense regions in a sparse matrix.
 use aveDegree or sqrtWeightedAveDegree or logWeightedAveDegree on a sparse matrix,
 which returns ((rowSet, colSet), score) for the most suspicious block.
+
+detectMultiple calls these functions on a matrix pair, i.e. an object holding
+CSR and CSC forms of the residual matrix, see MatrixPair. any other callable
+given to detectMultiple receives the residual matrix as a scipy CSR matrix
+without the removed edges, unless it is decorated with acceptsMatrixPair.
 """
 
-import random
+import inspect
+import logging
+from functools import partial
 
 import numpy as np
 from scipy import sparse
 
-from .MinTree import MinTree
+from fraudar import loader
+from fraudar.instrument import phase
+
+from .jit import HAVE_NUMBA, njit
+from .MinTree import (
+    BucketQueue,
+    LazyHeap,
+    _treeBuild,
+    _treeChangeVal,
+    _treeGetMin,
+)
 
 np.set_printoptions(linewidth=160)
 
+logger = logging.getLogger(__name__)
+
+# a triple of the removal order, the average scores, and the decrease of the
+# score by each removal, appended to the trace argument of the detectors;
+# see peelScores.
+Trace = tuple[np.ndarray, np.ndarray, np.ndarray]
 
-# given 2 lists corresponding to the edge source and destination,
-# this returns the sparse matrix representation of the data
+
+# given 2 lists (or integer arrays) corresponding to the edge source and destination,
+# this returns the sparse matrix representation of the data.
+# shape defaults to the smallest one containing every edge.
 # @profile
-def listToSparseMatrix(edgesSource, edgesDest):
-    m = max(edgesSource) + 1
-    n = max(edgesDest) + 1
-    M = sparse.coo_matrix(
-        ([1] * len(edgesSource), (edgesSource, edgesDest)), shape=(m, n)
-    )
-    M1 = M > 0
-    return M1.astype("int")
+def listToSparseMatrix(edgesSource, edgesDest, shape=None):
+    with phase("build_matrix"):
+        edgesSource = np.asarray(edgesSource, dtype=np.int64)
+        edgesDest = np.asarray(edgesDest, dtype=np.int64)
+        if shape is None:
+            shape = (edgesSource.max() + 1, edgesDest.max() + 1)
+        # duplicated edges are summed while converting to CSR, then reset to 1
+        M = sparse.csr_matrix(
+            (np.ones(len(edgesSource), dtype=int), (edgesSource, edgesDest)),
+            shape=shape,
+        )
+        M.data[:] = 1
+    return M
 
 
 # reads matrix from file and returns sparse matrix. first 2 columns should be row and column indices of ones.
+# the file is parsed in chunks by fraudar.loader, which also reads compressed,
+# CSV, Parquet and .npz edge lists.
 # @profile
-def readData(filename):
-    # dat = np.genfromtxt(filename, delimiter='\t', dtype=int)
-    edgesSource = []
-    edgesDest = []
-    with open(filename) as f:
-        for line in f:
-            toks = line.split()
-            edgesSource.append(int(toks[0]))
-            edgesDest.append(int(toks[1]))
-    return listToSparseMatrix(edgesSource, edgesDest)
-
-
-def detectMultiple(M, detectFunc, numToDetect):
-    Mcur = M.copy().tolil()
+def readData(filename, **kwargs):
+    return listToSparseMatrix(*loader.load_edges(filename, **kwargs))
+
+
+# detects numToDetect blocks one after another, removing the edges of each
+# detected block from the matrix before detecting the next one.
+# the residual matrix is kept as a MatrixPair, so that M is converted to CSR
+# and CSC only once. M can also be a matrix pair, e.g.
+# fraudar.diskgraph.DiskGraph, whose residual is a copy-on-write view.
+# nodeSusp, if given, is passed to detectFunc as prior suspiciousness of the
+# rows and columns.
+# detectFunc is given the matrix pair only if it accepts one, see
+# acceptsMatrixPair, and a CSR copy of the residual matrix otherwise.
+def detectMultiple(M, detectFunc, numToDetect, nodeSusp=None):
+    Mcur = M.residual() if isMatrixPair(M) else MatrixPair(M)
+    pairAware = takesMatrixPair(detectFunc)
     res = []
     for i in range(numToDetect):
-        ((rowSet, colSet), score) = detectFunc(Mcur)
+        Marg = Mcur if pairAware else residualMatrix(Mcur)
+        if nodeSusp is None:
+            ((rowSet, colSet), score) = detectFunc(Marg)
+        else:
+            ((rowSet, colSet), score) = detectFunc(Marg, nodeSusp)
         res.append(((rowSet, colSet), score))
-        (rs, cs) = Mcur.nonzero()
-        for i in range(len(rs)):
-            if rs[i] in rowSet and cs[i] in colSet:
-                Mcur[rs[i], cs[i]] = 0
+        if i + 1 == numToDetect:
+            break
+        with phase("remove_block"):
+            removeBlock(Mcur, rowSet, colSet)
+    return res
+
+
+# removes, in place, the edges of CSR matrix M whose row is in rowSet and
+# column is in colSet, using boolean masks over the rows and columns.
+# for a matrix pair, the edges are zeroed in both forms but not dropped, and
+# only the entries of the rows and columns in the block are visited, by
+# _zeroEntries if numba is installed.
+def removeBlock(M, rowSet, colSet):
+    (m, n) = M.shape
+    rows = np.fromiter(rowSet, dtype=np.int64, count=len(rowSet))
+    cols = np.fromiter(colSet, dtype=np.int64, count=len(colSet))
+    rowMask = indexMask(m, rows)
+    colMask = indexMask(n, cols)
+    if isMatrixPair(M):
+        for A, major, minorMask in (
+            (M.csr, rows, colMask),
+            (M.csc, cols, rowMask),
+        ):
+            if HAVE_NUMBA:
+                _zeroEntries(A.indptr, A.indices, A.data, major, minorMask)
+            else:
+                pos = segmentEntries(A.indptr, major)
+                A.data[pos[minorMask[A.indices[pos]]]] = 0
+        if isinstance(M, MatrixPair):
+            M.colVersions[cols] += 1
+        return M
+    entryRows = np.repeat(np.arange(m), np.diff(M.indptr))
+    M.data[rowMask[entryRows] & colMask[M.indices]] = 0
+    M.eliminate_zeros()
+    return M
+
+
+# returns positions of the entries stored in the given rows (columns) of a
+# CSR (CSC) matrix with the given indptr
+def segmentEntries(indptr, major):
+    starts = np.asarray(indptr[major], dtype=np.int64)
+    lens = np.asarray(indptr[major + 1], dtype=np.int64) - starts
+    offsets = np.cumsum(lens) - lens
+    return np.repeat(starts - offsets, lens) + np.arange(lens.sum())
+
+
+# zeroes, in place, the entries in the given rows (columns) of a CSR (CSC)
+# matrix whose column (row) is in minorMask, without allocating index arrays
+@njit(cache=True)
+def _zeroEntries(indptr, indices, data, major, minorMask):
+    for i in major:
+        for k in range(indptr[i], indptr[i + 1]):
+            if minorMask[indices[k]]:
+                data[k] = 0
+
+
+# a matrix pair is an object providing CSR and CSC forms of the same matrix as
+# csr and csc attributes, together with shape and residual()
+def isMatrixPair(M):
+    return hasattr(M, "csr") and hasattr(M, "csc")
+
+
+# marks detectFunc as accepting a matrix pair in place of a scipy sparse
+# matrix, so that detectMultiple passes the residual pair without copying it.
+def acceptsMatrixPair(detectFunc):
+    detectFunc.acceptsMatrixPair = True
+    return detectFunc
+
+
+# returns True if detectFunc, or the function wrapped by functools.partial,
+# is marked by acceptsMatrixPair.
+def takesMatrixPair(detectFunc):
+    while isinstance(detectFunc, partial):
+        detectFunc = detectFunc.func
+    return getattr(detectFunc, "acceptsMatrixPair", False)
+
+
+# returns True if detectFunc can be called with a trace argument.
+def takesTrace(detectFunc):
+    try:
+        return "trace" in inspect.signature(detectFunc).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+# returns a CSR copy of a matrix pair M without the entries zeroed by
+# removeBlock.
+def residualMatrix(M):
+    A = sparse.csr_matrix(M.csr, copy=True)
+    A.eliminate_zeros()
+    return A
+
+
+# an in-memory matrix pair holding a canonical CSR copy of M, i.e. with sorted
+# indices and without duplicates, and its CSC form.
+# entries are stored as floats so that products with weight vectors don't
+# copy the matrix to upcast it.
+# removed entries are zeroed in both forms by removeBlock but not dropped.
+# colVersions counts how many times removeBlock has changed each column, and
+# cache keeps values derived from the matrix, e.g. by columnDegrees, together
+# with the versions they were computed at, so that detecting the next block
+# refreshes them only on the changed columns.
+class MatrixPair:
+    def __init__(self, M, csc=None):
+        if csc is None:
+            M = M.tocsr().astype(np.float64)
+            M.sum_duplicates()
+            csc = M.tocsc()
+        self.csr = M
+        self.csc = csc
+        self.shape = M.shape
+        self.colVersions = np.zeros(M.shape[1], dtype=np.int64)
+        self.cache = {}
+
+    # returns a pair of which data can be modified without changing this
+    # pair. index arrays are shared.
+    def residual(self):
+        return MatrixPair(
+            withData(self.csr, self.csr.data.copy()),
+            withData(self.csc, self.csc.data.copy()),
+        )
+
+
+# returns a matrix sharing the indices and indptr of a compressed matrix M
+# with the given data
+def withData(M, data):
+    return type(M)((data, M.indices, M.indptr), shape=M.shape, copy=False)
+
+
+# returns CSR and CSC forms of M with sorted indices. a matrix pair is
+# returned as is, and the forms may then have explicit zeros.
+def csrCsc(M):
+    if isMatrixPair(M):
+        return (M.csr, M.csc)
+    M = M.tocsr()
+    if not M.has_canonical_format:
+        M = M.copy()
+        M.sum_duplicates()
+    return (M, M.tocsc())
+
+
+# returns the columns of a MatrixPair M changed by removeBlock since the
+# cached entry key was stored. if colScale is given, columns whose scale
+# differs from the stored one are also returned. returns None, i.e. the entry
+# must be computed from scratch, if M is not a MatrixPair, there is no such
+# entry, or the changed columns have more than a quarter of the entries.
+def changedColumns(M, key, colScale=None):
+    if not isinstance(M, MatrixPair) or key not in M.cache:
+        return None
+    (versions, oldScale, *_) = M.cache[key]
+    changed = versions != M.colVersions
+    if colScale is not None:
+        changed |= oldScale != colScale
+    changed = np.flatnonzero(changed)
+    if np.diff(M.csc.indptr)[changed].sum() > M.csc.nnz / 4:
+        return None
+    return changed
+
+
+# returns the number of nonzero entries in each column of M as a float array,
+# which is the column sums of a 0/1 matrix.
+# for a MatrixPair, only the columns changed since the last call are counted.
+def columnDegrees(M):
+    if not isMatrixPair(M):
+        M = M.tocsr()
+        return np.bincount(
+            M.indices[M.data != 0], minlength=M.shape[1]
+        ).astype(float)
+    if not isinstance(M, MatrixPair):
+        return countNonzeros(M.csc.indptr, M.csc.data)
+    changed = changedColumns(M, "colDegrees")
+    if changed is None:
+        res = countNonzeros(M.csc.indptr, M.csc.data)
+    else:
+        res = M.cache["colDegrees"][2]
+        pos = segmentEntries(M.csc.indptr, changed)
+        lens = np.diff(M.csc.indptr)[changed]
+        res[changed] = np.bincount(
+            np.repeat(np.arange(len(changed)), lens),
+            weights=M.csc.data[pos] != 0,
+            minlength=len(changed),
+        )
+    M.cache["colDegrees"] = (M.colVersions.copy(), None, res)
+    return res.copy()
+
+
+# returns the number of nonzero entries in each segment of a compressed matrix
+def countNonzeros(indptr, data):
+    if HAVE_NUMBA:
+        return _countNonzeros(indptr, data)
+    nonzeros = np.concatenate(([0], np.cumsum(data != 0)))
+    return (nonzeros[indptr[1:]] - nonzeros[indptr[:-1]]).astype(float)
+
+
+# returns the sums of the rows of M weighted by colScale, and the sums of the
+# columns. for a MatrixPair, only the changed columns, including columns whose
+# scale changed, and the rows having entries in them are summed again.
+def lineSums(M, colScale):
+    (Mr, Mc) = csrCsc(M)
+    (m, n) = M.shape
+    changed = changedColumns(M, "lineSums", colScale)
+    if changed is not None:
+        rows = np.flatnonzero(
+            indexMask(m, Mc.indices[segmentEntries(Mc.indptr, changed)])
+        )
+        if np.diff(Mr.indptr)[rows].sum() > Mr.nnz / 4:
+            changed = None
+    if changed is None:
+        rowSums = Mr @ colScale
+        colSums = Mc.T @ np.ones(m)
+    else:
+        (_, _, rowSums, colSums) = M.cache["lineSums"]
+        rowSums[rows] = Mr[rows] @ colScale
+        colSums[changed] = Mc.T[changed] @ np.ones(m)
+    if isinstance(M, MatrixPair):
+        M.cache["lineSums"] = (
+            M.colVersions.copy(),
+            colScale.copy(),
+            rowSums,
+            colSums,
+        )
+    return (rowSums.copy(), colSums.copy())
+
+
+# returns M weighted column-wise by colScale as a MatrixPair sharing the index
+# arrays of M. for a MatrixPair, the weighted pair is kept and only entries of
+# the changed columns are scaled again.
+def weightedPair(M, colScale):
+    (Mr, Mc) = csrCsc(M)
+    changed = changedColumns(M, "weighted", colScale)
+    if changed is None:
+        W = MatrixPair(
+            withData(Mr, Mr.data * colScale[Mr.indices]),
+            withData(Mc, Mc.data * np.repeat(colScale, np.diff(Mc.indptr))),
+        )
+    else:
+        W = M.cache["weighted"][2]
+        pos = np.flatnonzero(indexMask(M.shape[1], changed)[Mr.indices])
+        W.csr.data[pos] = Mr.data[pos] * colScale[Mr.indices[pos]]
+        pos = segmentEntries(Mc.indptr, changed)
+        W.csc.data[pos] = Mc.data[pos] * np.repeat(
+            colScale[changed], np.diff(Mc.indptr)[changed]
+        )
+    if isinstance(M, MatrixPair):
+        M.cache["weighted"] = (M.colVersions.copy(), colScale.copy(), W)
+    return W
+
+
+# counts nonzero entries in each segment of a compressed matrix
+@njit(cache=True)
+def _countNonzeros(indptr, data):
+    res = np.zeros(len(indptr) - 1)
+    for j in range(len(res)):
+        for k in range(indptr[j], indptr[j + 1]):
+            if data[k] != 0:
+                res[j] += 1
     return res
 
 
@@ -83,46 +373,80 @@ def detectMultiple(M, detectFunc, numToDetect):
 #              of fraudulent and camouflage edges
 # testIdx = 2: random camouflage, with double the density as in the previous setting
 # testIdx = 3: biased camouflage, more likely to add camouflage to high degree columns
-def injectCliqueCamo(M, m0, n0, p, testIdx):
+# numBlocks cliques are injected into rows [k*m0, (k+1)*m0) and columns [k*n0, (k+1)*n0) for each k, and
+# camouflage goes to the remaining columns. seed is an int or a np.random.Generator.
+# the injected edges are drawn as index arrays and merged into M in one sparse operation.
+def injectCliqueCamo(M, m0, n0, p, testIdx, seed=None, numBlocks=1):
     (m, n) = M.shape
-    M2 = M.copy().tolil()
-
-    colSum = np.squeeze(M2.sum(axis=0).A)
-    colSumPart = colSum[n0:n]
-    colSumPartPro = np.int_(colSumPart)
-    colIdx = np.arange(n0, n, 1)
-    population = np.repeat(colIdx, colSumPartPro, axis=0)
-
-    for i in range(m0):
+    if numBlocks * m0 > m or numBlocks * n0 > n:
+        raise ValueError("blocks don't fit in the matrix")
+    rng = np.random.default_rng(seed)
+    M = M.tocsr()
+    start = numBlocks * n0  # first column which can get camouflage
+    numCamo = n - start
+
+    if testIdx == 3:
+        # sample column positions in proportion to degrees without
+        # materializing the population of repeated columns
+        colSumCum = np.cumsum(columnDegrees(M)[start:]).astype(np.int64)
+    rows = []
+    cols = []
+    for k in range(numBlocks):
         # inject clique
-        for j in range(n0):
-            if random.random() < p:
-                M2[i, j] = 1
+        i, j = bernoulliCells(rng, m0, n0, p)
+        rows.append(i + k * m0)
+        cols.append(j + k * n0)
         # inject camo
-        if testIdx == 1:
-            thres = p * n0 / (n - n0)
-            for j in range(n0, n):
-                if random.random() < thres:
-                    M2[i, j] = 1
-        if testIdx == 2:
-            thres = 2 * p * n0 / (n - n0)
-            for j in range(n0, n):
-                if random.random() < thres:
-                    M2[i, j] = 1
+        if testIdx in (1, 2) and numCamo > 0:
+            thres = testIdx * p * n0 / numCamo
+            i, j = bernoulliCells(rng, m0, numCamo, min(thres, 1.0))
+            rows.append(i + k * m0)
+            cols.append(j + start)
         # biased camo
-        if testIdx == 3:
-            colRplmt = random.sample(population, int(n0 * p))
-            M2[i, colRplmt] = 1
+        if testIdx == 3 and numCamo > 0 and colSumCum[-1] > 0:
+            size = min(int(n0 * p), int(colSumCum[-1]))
+            for i in range(k * m0, (k + 1) * m0):
+                pos = rng.choice(colSumCum[-1], size, replace=False)
+                rows.append(np.full(size, i))
+                cols.append(
+                    np.searchsorted(colSumCum, pos, side="right") + start
+                )
+
+    rows = np.concatenate(rows)
+    cols = np.concatenate(cols)
+    injected = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=M.dtype), (rows, cols)), shape=(m, n)
+    )
+    injected.data[:] = 1
+    # set injected cells to 1 and keep the other entries of M
+    return (M + injected - M.multiply(injected)).tocsc()
 
-    return M2.tocsc()
 
+# draws each cell of a numRows by numCols grid independently with probability prob,
+# returning the row and column indices of the drawn cells. the number of cells is
+# drawn first, and then that many distinct cells, which has the same distribution.
+def bernoulliCells(rng, numRows, numCols, prob):
+    numCells = numRows * numCols
+    pos = rng.choice(numCells, rng.binomial(numCells, prob), replace=False)
+    return np.divmod(pos, numCols)
 
-# sum of weighted edges in rowSet and colSet, plus node suspiciousness values, in matrix M
+
+# sum of weighted edges in rowSet and colSet, plus node suspiciousness values, in matrix M.
+# the edges are summed by one matrix-vector product with a column mask, so
+# that the submatrix is never built.
 def c2Score(M, rowSet, colSet, nodeSusp):
-    suspTotal = (
-        nodeSusp[0][list(rowSet)].sum() + nodeSusp[1][list(colSet)].sum()
-    )
-    return M[list(rowSet), :][:, list(colSet)].sum(axis=None) + suspTotal
+    (m, n) = M.shape
+    rowMask = indexMask(m, np.fromiter(rowSet, dtype=np.int64))
+    colMask = indexMask(n, np.fromiter(colSet, dtype=np.int64))
+    suspTotal = nodeSusp[0][rowMask].sum() + nodeSusp[1][colMask].sum()
+    return (M @ colMask.astype(float))[rowMask].sum() + suspTotal
+
+
+# returns a boolean array of the given size which is True at indices
+def indexMask(size, indices):
+    mask = np.zeros(size, dtype=bool)
+    mask[indices] = True
+    return mask
 
 
 def jaccard(pred, actual):
@@ -172,31 +496,67 @@ def getRowFMeasure(pred, actual, idx):
 
 
 # run greedy algorithm using square root column weights
-def sqrtWeightedAveDegree(M, nodeSusp=None):
-    (m, n) = M.shape
-    colSums = M.sum(axis=0)
-    colWeights = 1.0 / np.sqrt(np.squeeze(colSums) + 5)
-    colDiag = sparse.lil_matrix((n, n))
-    colDiag.setdiag(colWeights)
-    W = M * colDiag
-    return fastGreedyDecreasing(W, colWeights, nodeSusp)
+@acceptsMatrixPair
+def sqrtWeightedAveDegree(
+    M, nodeSusp=None, engine=None, priority=None, epsilon=None, trace=None
+):
+    with phase("weighting"):
+        colWeights = 1.0 / np.sqrt(columnDegrees(M) + 5)
+    return weightedGreedyDecreasing(
+        M, colWeights, nodeSusp, engine, priority, epsilon, trace
+    )
 
 
 # run greedy algorithm using logarithmic weights
-def logWeightedAveDegree(M, nodeSusp=None):
-    (m, n) = M.shape
-    colSums = M.sum(axis=0)
-    colWeights = np.squeeze(np.array(1.0 / np.log(np.squeeze(colSums) + 5)))
-    colDiag = sparse.lil_matrix((n, n))
-    colDiag.setdiag(colWeights)
-    W = M * colDiag
-    print("finished computing weight matrix")
-    return fastGreedyDecreasing(W, colWeights, nodeSusp)
+@acceptsMatrixPair
+def logWeightedAveDegree(
+    M, nodeSusp=None, engine=None, priority=None, epsilon=None, trace=None
+):
+    with phase("weighting"):
+        colWeights = 1.0 / np.log(columnDegrees(M) + 5)
+    return weightedGreedyDecreasing(
+        M, colWeights, nodeSusp, engine, priority, epsilon, trace
+    )
 
 
-def aveDegree(M, nodeSusp=None):
+@acceptsMatrixPair
+def aveDegree(
+    M, nodeSusp=None, engine=None, priority=None, epsilon=None, trace=None
+):
     (m, n) = M.shape
-    return fastGreedyDecreasing(M, [1] * n, nodeSusp)
+    return fastGreedyDecreasing(
+        M, [1] * n, nodeSusp, engine, priority, epsilon, trace
+    )
+
+
+# runs fastGreedyDecreasing on M weighted column-wise by colWeights.
+# the compiled and batch engines scale entries on the fly instead of building
+# the weighted matrix, which also works on a matrix pair.
+def weightedGreedyDecreasing(
+    M,
+    colWeights,
+    nodeSusp=None,
+    engine=None,
+    priority=None,
+    epsilon=None,
+    trace=None,
+):
+    engine = resolveEngine(engine, priority, epsilon)
+    if engine == "compiled":
+        return compiledGreedyDecreasing(
+            M, colWeights, nodeSusp, unweighted=True, trace=trace
+        )
+    if engine == "batch":
+        return batchGreedyDecreasing(
+            M, colWeights, nodeSusp, epsilon, unweighted=True, trace=trace
+        )
+    with phase("weighting"):
+        # scale data through column indices; index arrays are shared with M.
+        colWeights = np.asarray(colWeights, dtype=np.float64)
+        W = weightedPair(M, colWeights)
+    return fastGreedyDecreasing(
+        W, colWeights, nodeSusp, engine, priority, trace=trace
+    )
 
 
 def subsetAboveDegree(M, col_thres, row_thres):
@@ -213,58 +573,133 @@ def subsetAboveDegree(M, col_thres, row_thres):
     return M2, rowFilter, colFilter
 
 
-# @profile
-def fastGreedyDecreasing(M, colWeights, nodeSusp=None):
+# same as subsetAboveDegree, but repeats the filtering until every remaining row has more than
+# row_thres and every remaining column more than col_thres nonzero entries, i.e. a k-core style
+# filter. degrees are counted by matrix-vector products over the current masks, and the
+# submatrix is built once at the end. rowFilter and colFilter are integer arrays.
+def coreSubsetAboveDegree(M, col_thres, row_thres):
+    M = M.tocsr()
+    B = withData(M, (M.data != 0).astype(float))
     (m, n) = M.shape
-    if nodeSusp is None:
-        nodeSusp = (np.zeros(m), np.zeros(n))
-    Ml = M.tolil()
-    Mlt = M.transpose().tolil()
-    rowSet = set(range(0, m))
-    colSet = set(range(0, n))
-    curScore = c2Score(M, rowSet, colSet, nodeSusp)
-
-    bestAveScore = curScore / (len(rowSet) + len(colSet))
-    print("finished initialization")
-    rowDeltas = (
-        np.squeeze(M.sum(axis=1).A) + nodeSusp[0]
-    )  # contribution of this row to total weight, i.e. *decrease* in total weight when *removing* this row
-    colDeltas = np.squeeze(M.sum(axis=0).A) + nodeSusp[1]
-    print("finished setting deltas")
-    rowTree = MinTree(rowDeltas)
-    colTree = MinTree(colDeltas)
-    print("finished building min trees")
+    rowValid = np.ones(m, dtype=bool)
+    colValid = np.ones(n, dtype=bool)
+    while True:
+        newRowValid = rowValid & (B @ colValid > row_thres)
+        newColValid = colValid & (B.T @ newRowValid > col_thres)
+        if (newRowValid == rowValid).all() and (newColValid == colValid).all():
+            break
+        rowValid = newRowValid
+        colValid = newColValid
+    rowFilter = np.flatnonzero(rowValid)
+    colFilter = np.flatnonzero(colValid)
+    return M[rowFilter][:, colFilter], rowFilter, colFilter
+
+
+# engine chooses the implementation of the peeling loop:
+# "python" iterates CSR rows and CSC columns with priority structures, and "compiled" runs the
+# whole loop in a numba kernel on CSR/CSC arrays. The default (None) is
+# "compiled" if numba is installed, and "python" otherwise. Both return the
+# same result.
+# "batch" runs batchGreedyDecreasing, which approximates the result in a few
+# vectorized rounds. epsilon sets its trade-off, and giving only epsilon
+# chooses "batch".
+# priority is the class of the priority structures used by the "python" engine,
+# e.g. MinTree, ArrayMinTree, BucketQueue, or LazyHeap. The default (None) is
+# chosen by choosePriority.
+# M is the weighted matrix, and removing a node decreases the degrees of its
+# neighbors by the entries between them, so edge weights of M are kept as is.
+# trace, if given, is a list to which the removal order, the average scores,
+# and the decrease of the score by each removal are appended; see peelScores.
+# @profile
+def fastGreedyDecreasing(
+    M,
+    colWeights,
+    nodeSusp=None,
+    engine=None,
+    priority=None,
+    epsilon=None,
+    trace=None,
+):
+    engine = resolveEngine(engine, priority, epsilon)
+    if engine == "compiled":
+        return compiledGreedyDecreasing(M, colWeights, nodeSusp, trace=trace)
+    if engine == "batch":
+        return batchGreedyDecreasing(
+            M, colWeights, nodeSusp, epsilon, trace=trace
+        )
+
+    with phase("build_trees"):
+        (Mr, Mc) = csrCsc(M)
+        (m, n) = M.shape
+        if nodeSusp is None:
+            nodeSusp = (np.zeros(m), np.zeros(n))
+        rowSet = set(range(0, m))
+        colSet = set(range(0, n))
+        # every node is in the sets, so the score is the sum of the whole matrix
+        curScore = Mr.sum() + nodeSusp[0].sum() + nodeSusp[1].sum()
+
+        bestAveScore = curScore / (len(rowSet) + len(colSet))
+        rowDeltas = (
+            np.squeeze(Mr.sum(axis=1).A) + nodeSusp[0]
+        )  # contribution of this row to total weight, i.e. *decrease* in total weight when *removing* this row
+        colDeltas = np.squeeze(Mc.sum(axis=0).A) + nodeSusp[1]
+        if priority is None:
+            priority = choosePriority(Mr.data, rowDeltas, colDeltas)
+        rowTree = priority(rowDeltas)
+        colTree = priority(colDeltas)
 
     numDeleted = 0
     deleted = []
+    aveScores = [bestAveScore]
+    deltas = []
     bestNumDeleted = 0
 
-    while rowSet and colSet:
-        if (len(colSet) + len(rowSet)) % 100000 == 0:
-            print("current set size = %d" % (len(colSet) + len(rowSet),))
-        (nextRow, rowDelt) = rowTree.getMin()
-        (nextCol, colDelt) = colTree.getMin()
-        if rowDelt <= colDelt:
-            curScore -= rowDelt
-            for j in Ml.rows[nextRow]:
-                colTree.changeVal(j, -colWeights[j])
-            rowSet -= {nextRow}
-            rowTree.changeVal(nextRow, float("inf"))
-            deleted.append((0, nextRow))
-        else:
-            curScore -= colDelt
-            for i in Mlt.rows[nextCol]:
-                rowTree.changeVal(i, -colWeights[nextCol])
-            colSet -= {nextCol}
-            colTree.changeVal(nextCol, float("inf"))
-            deleted.append((1, nextCol))
-
-        numDeleted += 1
-        curAveScore = curScore / (len(colSet) + len(rowSet))
-
-        if curAveScore > bestAveScore:
-            bestAveScore = curAveScore
-            bestNumDeleted = numDeleted
+    with phase("peel") as p:
+        while rowSet and colSet:
+            if (len(colSet) + len(rowSet)) % 100000 == 0:
+                logger.debug(
+                    "current set size = %d", len(colSet) + len(rowSet)
+                )
+            (nextRow, rowDelt) = rowTree.getMin()
+            (nextCol, colDelt) = colTree.getMin()
+            if rowDelt <= colDelt:
+                curScore -= rowDelt
+                (start, end) = (Mr.indptr[nextRow], Mr.indptr[nextRow + 1])
+                colTree.changeVals(Mr.indices[start:end], -Mr.data[start:end])
+                rowSet -= {nextRow}
+                rowTree.changeVal(nextRow, float("inf"))
+                deleted.append((0, nextRow))
+                deltas.append(rowDelt)
+            else:
+                curScore -= colDelt
+                (start, end) = (Mc.indptr[nextCol], Mc.indptr[nextCol + 1])
+                rowTree.changeVals(Mc.indices[start:end], -Mc.data[start:end])
+                colSet -= {nextCol}
+                colTree.changeVal(nextCol, float("inf"))
+                deleted.append((1, nextCol))
+                deltas.append(colDelt)
+
+            numDeleted += 1
+            curAveScore = curScore / (len(colSet) + len(rowSet))
+            aveScores.append(curAveScore)
+
+            if curAveScore > bestAveScore:
+                bestAveScore = curAveScore
+                bestNumDeleted = numDeleted
+        p.items = numDeleted
+
+    if trace is not None:
+        order = np.array(
+            [i if axis == 0 else m + i for (axis, i) in deleted],
+            dtype=np.int64,
+        )
+        trace.append(
+            (
+                order,
+                np.array(aveScores, dtype=np.float64),
+                np.array(deltas, dtype=np.float64),
+            )
+        )
 
     # reconstruct the best row and column sets
     finalRowSet = set(range(m))
@@ -275,3 +710,301 @@ def fastGreedyDecreasing(M, colWeights, nodeSusp=None):
         else:
             finalColSet.remove(deleted[i][1])
     return (finalRowSet, finalColSet), bestAveScore
+
+
+# returns the engine to be used, checking the arguments of fastGreedyDecreasing
+def resolveEngine(engine, priority, epsilon=None):
+    if engine is None:
+        if epsilon is not None:
+            engine = "batch"
+        else:
+            engine = (
+                "compiled" if HAVE_NUMBA and priority is None else "python"
+            )
+    if engine in ("compiled", "batch") and priority is not None:
+        raise ValueError(f"{engine} engine doesn't take a priority structure")
+    if engine != "batch" and epsilon is not None:
+        raise ValueError(f"{engine} engine doesn't take epsilon")
+    if engine not in ("compiled", "python", "batch"):
+        raise ValueError(f"unknown engine: {engine}")
+    return engine
+
+
+# returns BucketQueue if the entries and the degrees are integers, i.e. every
+# degree stays an integer while peeling, and LazyHeap otherwise.
+# BucketQueue allocates a bucket for every degree from 0 to the largest one,
+# so it is also chosen only if the entries and the degrees are non-negative
+# and no degree exceeds the number of entries and nodes, which holds for
+# unweighted matrices without large priors.
+def choosePriority(data, rowDeltas, colDeltas):
+    bound = len(data) + len(rowDeltas) + len(colDeltas)
+    for a in (data, rowDeltas, colDeltas):
+        if len(a) == 0:
+            continue
+        if a.min() < 0 or a.max() > bound or (np.mod(a, 1) != 0).any():
+            return LazyHeap
+    return BucketQueue
+
+
+# same as fastGreedyDecreasing, but the peeling loop runs in _peel on the
+# indptr/indices/data arrays of CSR and CSC forms of M.
+# if unweighted is True, entries of M are multiplied by colWeights on the fly,
+# so that the weighted matrix is never built.
+def compiledGreedyDecreasing(
+    M, colWeights, nodeSusp=None, unweighted=False, trace=None
+):
+    with phase("build_trees"):
+        (m, n) = M.shape
+        if nodeSusp is None:
+            nodeSusp = (np.zeros(m), np.zeros(n))
+        colWeights = np.asarray(colWeights, dtype=np.float64)
+        (Mr, Mc) = csrCsc(M)
+        colScale = colWeights if unweighted else np.ones(n)
+        (rowDeltas, colSums) = lineSums(M, colScale)
+        colDeltas = colSums * colScale
+        curScore = float(colDeltas.sum()) if unweighted else float(Mr.sum())
+        curScore += float(nodeSusp[0].sum() + nodeSusp[1].sum())
+        rowDeltas = rowDeltas + nodeSusp[0]
+        colDeltas = colDeltas + nodeSusp[1]
+
+    with phase("peel") as p:
+        order, aveScores, deltas, bestNumDeleted, bestAveScore = _peel(
+            Mr.indptr,
+            Mr.indices,
+            Mr.data,
+            Mc.indptr,
+            Mc.indices,
+            Mc.data,
+            colScale,
+            rowDeltas,
+            colDeltas,
+            curScore,
+        )
+        p.items = len(order)
+    if trace is not None:
+        trace.append((order, aveScores, deltas))
+
+    # reconstruct the best row and column sets
+    removed = order[:bestNumDeleted]
+    rowMask = np.ones(m, dtype=bool)
+    rowMask[removed[removed < m]] = False
+    colMask = np.ones(n, dtype=bool)
+    colMask[removed[removed >= m] - m] = False
+    finalRowSet = set(np.flatnonzero(rowMask).tolist())
+    finalColSet = set(np.flatnonzero(colMask).tolist())
+    return (finalRowSet, finalColSet), bestAveScore
+
+
+# approximates fastGreedyDecreasing by peeling in rounds: each round removes
+# every remaining row and column whose degree is at most (1 + epsilon) times
+# the average degree, so that at most a 1 / (1 + epsilon) fraction of the nodes
+# remains and O(log(m + n) / epsilon) rounds are run. the best average score
+# among the rounds is within a factor 2(1 + epsilon) of the densest block,
+# while the exact greedy order guarantees a factor 2. only the entries of the
+# removed rows and columns are visited, so all rounds take O(nnz) time in
+# total, plus O(m + n) per round. epsilon defaults to 0.1.
+# if unweighted is True, entries of M are multiplied by colWeights on the fly.
+# the removal order in trace lists the nodes round by round, and the average
+# score of every node removed in a round is the one at the start of the round.
+# the decrease of a column removed with some of its rows excludes the entries
+# between them, which are counted in the decrease of the rows.
+def batchGreedyDecreasing(
+    M, colWeights, nodeSusp=None, epsilon=None, unweighted=False, trace=None
+):
+    if epsilon is None:
+        epsilon = 0.1
+    if epsilon <= 0:
+        raise ValueError(f"epsilon must be positive: {epsilon}")
+    (m, n) = M.shape
+    if nodeSusp is None:
+        nodeSusp = (np.zeros(m), np.zeros(n))
+    (Mr, Mc) = csrCsc(M)
+    colScale = (
+        np.asarray(colWeights, dtype=np.float64) if unweighted else np.ones(n)
+    )
+    (rowDeltas, colSums) = lineSums(M, colScale)
+    rowDeltas += nodeSusp[0]
+    colDeltas = colSums * colScale + nodeSusp[1]
+
+    # the round in which each row and column is removed; -1 while remaining
+    rowRound = np.full(m, -1)
+    colRound = np.full(n, -1)
+    # every node is in the first round, as in fastGreedyDecreasing
+    bestRound = 0
+    bestAveScore = (rowDeltas.sum() + nodeSusp[1].sum()) / (m + n)
+    aveScores = []
+    # the decrease of the score by removing each row and column
+    rowRemoved = np.zeros(m)
+    colRemoved = np.zeros(n)
+    with phase("peel") as p:
+        rnd = 0
+        while True:
+            rowAlive = rowRound < 0
+            colAlive = colRound < 0
+            numAlive = np.count_nonzero(rowAlive) + np.count_nonzero(colAlive)
+            # the score is the weight of the remaining entries, counted once
+            # in the row degrees, plus the suspiciousness of the columns
+            curScore = rowDeltas[rowAlive].sum() + nodeSusp[1][colAlive].sum()
+            curAveScore = curScore / numAlive if numAlive else 0.0
+            aveScores.append(curAveScore)
+            if not (rowAlive.any() and colAlive.any()):
+                break
+            if curAveScore > bestAveScore:
+                (bestRound, bestAveScore) = (rnd, curAveScore)
+
+            threshold = (
+                (1 + epsilon)
+                * (rowDeltas[rowAlive].sum() + colDeltas[colAlive].sum())
+                / numAlive
+            )
+            rows = np.flatnonzero(rowAlive & (rowDeltas <= threshold))
+            cols = np.flatnonzero(colAlive & (colDeltas <= threshold))
+            rowRound[rows] = rnd
+            colRound[cols] = rnd
+            rowRemoved[rows] = rowDeltas[rows]
+
+            # decrease the degrees of the neighbors of the removed nodes
+            pos = segmentEntries(Mr.indptr, rows)
+            nbrs = Mr.indices[pos]
+            colDeltas -= np.bincount(
+                nbrs, weights=Mr.data[pos] * colScale[nbrs], minlength=n
+            )
+            colRemoved[cols] = colDeltas[cols]
+            pos = segmentEntries(Mc.indptr, cols)
+            weights = Mc.data[pos] * np.repeat(
+                colScale[cols], np.diff(Mc.indptr)[cols]
+            )
+            rowDeltas -= np.bincount(
+                Mc.indices[pos], weights=weights, minlength=m
+            )
+            rnd += 1
+        p.items = np.count_nonzero(rowRound >= 0) + np.count_nonzero(
+            colRound >= 0
+        )
+
+    if trace is not None:
+        rounds = np.concatenate([rowRound, colRound])
+        removed = np.flatnonzero(rounds >= 0)
+        order = removed[np.argsort(rounds[removed], kind="stable")]
+        aveScores = np.array(aveScores, dtype=np.float64)
+        trace.append(
+            (
+                order,
+                np.append(aveScores[rounds[order]], aveScores[-1]),
+                np.concatenate([rowRemoved, colRemoved])[order],
+            )
+        )
+
+    # the best block is the nodes remaining at the start of the best round
+    finalRowSet = set(
+        np.flatnonzero((rowRound < 0) | (rowRound >= bestRound)).tolist()
+    )
+    finalColSet = set(
+        np.flatnonzero((colRound < 0) | (colRound >= bestRound)).tolist()
+    )
+    return (finalRowSet, finalColSet), float(bestAveScore)
+
+
+# peels rows and columns greedily, returning the removal order, where row i is
+# recorded as i and column j as m + j, the average score after each number of
+# removals, the decrease of the score by each removal, the number of removals
+# giving the best average score, and that score. removing an entry decreases the degree of its
+# row and column by the entry times colScale of its column.
+@njit(cache=True)
+def _peel(
+    rowIndptr,
+    rowIndices,
+    rowData,
+    colIndptr,
+    colIndices,
+    colData,
+    colScale,
+    rowDeltas,
+    colDeltas,
+    curScore,
+):
+    m = len(rowDeltas)
+    n = len(colDeltas)
+    rowHeight = 0
+    while 2**rowHeight < m:
+        rowHeight += 1
+    colHeight = 0
+    while 2**colHeight < n:
+        colHeight += 1
+    rowBranches = 2**rowHeight - 1
+    colBranches = 2**colHeight - 1
+    rowNodes = _treeBuild(rowDeltas, rowHeight)
+    colNodes = _treeBuild(colDeltas, colHeight)
+
+    numRows = m
+    numCols = n
+    bestAveScore = curScore / (m + n)
+    bestNumDeleted = 0
+    numDeleted = 0
+    order = np.empty(m + n, dtype=np.int64)
+    aveScores = np.empty(m + n + 1)
+    aveScores[0] = bestAveScore
+    deltas = np.empty(m + n)
+
+    while numRows > 0 and numCols > 0:
+        r = _treeGetMin(rowNodes, rowHeight)
+        c = _treeGetMin(colNodes, colHeight)
+        rowDelt = rowNodes[r]
+        colDelt = colNodes[c]
+        if rowDelt <= colDelt:
+            nextRow = r - rowBranches
+            curScore -= rowDelt
+            for k in range(rowIndptr[nextRow], rowIndptr[nextRow + 1]):
+                j = rowIndices[k]
+                _treeChangeVal(
+                    colNodes,
+                    colHeight,
+                    colBranches + j,
+                    -rowData[k] * colScale[j],
+                )
+            _treeChangeVal(rowNodes, rowHeight, r, np.inf)
+            order[numDeleted] = nextRow
+            deltas[numDeleted] = rowDelt
+            numRows -= 1
+        else:
+            nextCol = c - colBranches
+            curScore -= colDelt
+            w = colScale[nextCol]
+            for k in range(colIndptr[nextCol], colIndptr[nextCol + 1]):
+                i = colIndices[k]
+                _treeChangeVal(
+                    rowNodes, rowHeight, rowBranches + i, -colData[k] * w
+                )
+            _treeChangeVal(colNodes, colHeight, c, np.inf)
+            order[numDeleted] = m + nextCol
+            deltas[numDeleted] = colDelt
+            numCols -= 1
+
+        numDeleted += 1
+        curAveScore = curScore / (numRows + numCols)
+        aveScores[numDeleted] = curAveScore
+        if curAveScore > bestAveScore:
+            bestAveScore = curAveScore
+            bestNumDeleted = numDeleted
+
+    return (
+        order[:numDeleted],
+        aveScores[: numDeleted + 1],
+        deltas[:numDeleted],
+        bestNumDeleted,
+        bestAveScore,
+    )
+
+
+# returns the suspiciousness of each row and column of an m x n matrix, given
+# the removal order and the average scores in a trace appended by an engine.
+# the suspiciousness of a node is the largest average score among the sets
+# remaining while the node was not removed yet, so that the nodes of the
+# detected block have its score and the others rank by how long they survive
+# the peeling. a threshold on the suspiciousness gives one of those sets.
+def peelScores(order, aveScores, shape):
+    (m, n) = shape
+    best = np.maximum.accumulate(aveScores)
+    scores = np.full(m + n, best[-1])
+    scores[order] = best[: len(order)]
+    return (scores[:m], scores[m:])
@@ -0,0 +1,43 @@
+#
+#  jit.py
+#
+#  Copyright (c) 2016-2025 Junpei Kawamoto
+#
+#  This file is part of rgmining-fraudar.
+#
+#  rgmining-fraudar is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  rgmining-fraudar is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with rgmining-fraudar. If not, see <http://www.gnu.org/licenses/>.
+#
+# mypy: ignore-errors
+"""
+Optional JIT compilation. If numba is installed, njit compiles the decorated
+function; otherwise it returns the function as is, so kernels written for
+numba still run as plain Python.
+Install the jit extra, i.e. pip install rgmining-fraudar[jit], to enable it.
+"""
+
+try:
+    from numba import njit as _njit
+
+    HAVE_NUMBA = True
+except ImportError:  # pragma: no cover
+    _njit = None
+    HAVE_NUMBA = False
+
+
+def njit(*args, **kwargs):
+    if _njit is not None:
+        return _njit(*args, **kwargs)
+    if len(args) == 1 and callable(args[0]) and not kwargs:
+        return args[0]
+    return lambda f: f
@@ -20,45 +20,66 @@
 #
 """Provide a review graph which runs Fraudar algorithm."""
 
-import tempfile
-from bisect import bisect_left
-from collections import defaultdict
-from typing import Any, Final, Protocol
+from collections.abc import Iterator, Mapping, Sequence
+from functools import partial
+from typing import (
+    Any,
+    Final,
+    Generic,
+    Literal,
+    Protocol,
+    TypeVar,
+    overload,
+)
 
 import numpy as np
+from numpy.typing import NDArray
+from scipy import sparse
 
+from fraudar import parallel
 from fraudar.export import greedy
 from fraudar.export.greedy import logWeightedAveDegree
+from fraudar.instrument import phase
+from fraudar.parallel import Block, NodeSusp
+from fraudar.storage import EdgeStore
+from fraudar.weighting import Weighting
 
 
 class Node:
     """Node of the ReviewGraph.
 
-    A node has a name and a link to the graph. It also implements
-    :meth:`__hash__` function so that each node can be stored in
-    dictionaries.
+    A node has a name, a dense integer ID, and a link to the graph.
+    It also implements :meth:`__hash__` function so that each node can be
+    stored in dictionaries.
 
     Args:
       graph: graph object this node belongs to.
       name: name of this node.
+      node_id: ID of this node, which is the index in the graph's node list.
     """
 
     graph: Final["ReviewGraph"]
     """The graph object this node belongs to."""
     name: Final[str]
     """Name of this node."""
+    node_id: Final[int]
+    """ID of this node, which is the index in the graph's node list."""
 
-    __slots__ = ("graph", "name")
+    __slots__ = ("graph", "name", "node_id")
 
-    def __init__(self, graph: "ReviewGraph", name: str) -> None:
+    def __init__(
+        self, graph: "ReviewGraph", name: str, node_id: int = 0
+    ) -> None:
         """Construct a node instance.
 
         Args:
           graph: graph object this node belongs to.
           name: name of this node.
+          node_id: ID of this node. (default: 0)
         """
         self.graph = graph
         self.name = name
+        self.node_id = node_id
 
     def __hash__(self) -> int:
         """Returns a hash value of this instance."""
@@ -77,18 +98,47 @@ class Reviewer(Node):
     Args:
       graph: graph object this reviewer belongs to.
       name: name of this reviewer.
+      anomalous_score: initial anomalous score of a reviewer not created by
+        the graph. (default: 0)
+      node_id: ID of this reviewer. (default: 0)
     """
 
-    anomalous_score: float
-    """anomalous score of this reviewer."""
+    _anomalous_score: float
+    """Anomalous score used while this reviewer is not in the graph."""
 
-    __slots__ = ("anomalous_score",)
+    __slots__ = ("_anomalous_score",)
 
     def __init__(
-        self, graph: "ReviewGraph", name: str, anomalous_score: float = 0
+        self,
+        graph: "ReviewGraph",
+        name: str,
+        anomalous_score: float = 0,
+        node_id: int = 0,
     ) -> None:
-        super().__init__(graph, name)
-        self.anomalous_score = anomalous_score
+        super().__init__(graph, name, node_id)
+        self._anomalous_score = anomalous_score
+
+    @property
+    def anomalous_score(self) -> float:
+        """anomalous score of this reviewer.
+
+        Scores of reviewers in the graph are stored in the graph's array of
+        scores, which :meth:`ReviewGraph.anomalous_scores` returns.
+        """
+        if self not in self.graph.reviewers:
+            return self._anomalous_score
+        return float(self.graph._score_buffer(self.node_id + 1)[self.node_id])
+
+    @anomalous_score.setter
+    def anomalous_score(self, score: float) -> None:
+        if self not in self.graph.reviewers:
+            self._anomalous_score = score
+            return
+        scores = self.graph._score_buffer(self.node_id + 1)
+        if score != scores[self.node_id]:
+            scores[self.node_id] = score
+            # summaries of products depend on anomalous scores.
+            self.graph._summaries = None
 
 
 class Product(Node):
@@ -100,20 +150,174 @@ class Product(Node):
     Args:
       graph: graph object this product belongs to.
       name: name of this product.
+      node_id: ID of this product. (default: 0)
     """
 
     __slots__ = ()
 
     @property
     def summary(self) -> float:
-        """Summary of ratings given to this product."""
-        reviewers = self.graph.reviews[self].keys()
-        ratings = [self.graph.reviews[self][r] for r in reviewers]
-        weights = [1 - r.anomalous_score for r in reviewers]
-        if sum(weights) == 0:
-            return float(np.mean(ratings))
-        else:
-            return float(np.average(ratings, weights=weights))
+        """Summary of ratings given to this product.
+
+        It is taken from :meth:`ReviewGraph.summaries`, which computes the
+        summaries of all products at once and caches them.
+        """
+        return float(self.graph.summaries()[self.node_id])
+
+
+_N = TypeVar("_N", bound=Node)
+
+
+class NodeList(Sequence[_N], Generic[_N]):
+    """Collection of nodes of one type, indexed by node IDs.
+
+    Only names are stored for each node, and node objects are created when
+    they are accessed for the first time.
+
+    Args:
+      graph: graph object the nodes belong to.
+      node_type: class of the nodes, i.e. :class:`Reviewer` or
+        :class:`Product`.
+    """
+
+    _graph: Final["ReviewGraph"]
+    _node_type: type[_N]
+    _names: Final[list[str]]
+    _nodes: dict[int, _N]
+    _index: tuple[NDArray[np.str_], NDArray[np.int64]] | None
+    """Sorted names and their IDs, built when names are looked up."""
+
+    def __init__(self, graph: "ReviewGraph", node_type: type[_N]) -> None:
+        self._graph = graph
+        self._node_type = node_type
+        self._names = []
+        self._nodes = {}
+        self._index = None
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    @overload
+    def __getitem__(self, i: int) -> _N: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> list[_N]: ...
+
+    def __getitem__(self, i: int | slice) -> _N | list[_N]:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        node = self._nodes.get(i)
+        if node is None:
+            node = self._node_type(self._graph, self._names[i], node_id=i)
+            self._nodes[i] = node
+        return node
+
+    def __iter__(self) -> Iterator[_N]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def __contains__(self, node: object) -> bool:
+        return (
+            isinstance(node, self._node_type)
+            and self._nodes.get(node.node_id) is node
+        )
+
+    def append(self, node: _N) -> None:
+        """Append a node created by the graph.
+
+        Args:
+          node: the new node, of which ID must be the length of this list.
+        """
+        self._nodes[len(self._names)] = node
+        self._names.append(node.name)
+        self._index = None
+
+    def lookup(self, names: NDArray[np.str_]) -> NDArray[np.int64]:
+        """Find IDs of nodes by names, adding nodes for unknown names.
+
+        If several nodes have the same name, the smallest ID is returned.
+
+        Args:
+          names: names of nodes.
+
+        Returns:
+          IDs of the nodes.
+        """
+        uniq, inverse = np.unique(names, return_inverse=True)
+        ids = np.empty(len(uniq), dtype=np.int64)
+        found = np.zeros(len(uniq), dtype=bool)
+        if self._names:
+            if self._index is None:
+                all_names = np.array(self._names)
+                order = np.argsort(all_names, kind="stable")
+                self._index = (all_names[order], order)
+            sorted_names, sorted_ids = self._index
+            pos = np.searchsorted(sorted_names, uniq)
+            pos[pos == len(sorted_names)] = 0
+            found = sorted_names[pos] == uniq
+            ids[found] = sorted_ids[pos[found]]
+
+        new = ~found
+        ids[new] = np.arange(len(self), len(self) + np.count_nonzero(new))
+        if new.any():
+            self._names.extend(uniq[new].tolist())
+            self._index = None
+        return ids[inverse]
+
+
+class Reviews(Mapping[Product, dict[Reviewer, float]]):
+    """Read-only view of reviews grouped by products.
+
+    Reviews of a product are found through an index of the edges sorted by
+    products, which is built once and shared until reviews are added.
+    Products without reviews map to an empty dictionary.
+
+    Args:
+      graph: graph object the reviews belong to.
+    """
+
+    _graph: Final["ReviewGraph"]
+
+    def __init__(self, graph: "ReviewGraph") -> None:
+        self._graph = graph
+
+    def __getitem__(self, product: Product) -> dict[Reviewer, float]:
+        """Return reviews of a product.
+
+        Args:
+          product: the product.
+
+        Returns:
+          a new dictionary of which key is a reviewer and value is the
+          latest rating from the reviewer to the product.
+        """
+        if product not in self._graph.products:
+            raise KeyError(product)
+        order, indptr = self._graph._review_index()
+        j = product.node_id
+        if j + 1 >= len(indptr):
+            return {}
+        idx = order[indptr[j] : indptr[j + 1]]
+        reviewers = self._graph.reviewers
+        return {
+            reviewers[i]: rating
+            for i, rating in zip(
+                self._graph.edges.reviewer_ids[idx].tolist(),
+                self._graph.edges.ratings[idx].tolist(),
+                strict=True,
+            )
+        }
+
+    def __iter__(self) -> Iterator[Product]:
+        _, indptr = self._graph._review_index()
+        for j in np.flatnonzero(np.diff(indptr)).tolist():
+            yield self._graph.products[j]
+
+    def __len__(self) -> int:
+        _, indptr = self._graph._review_index()
+        return int(np.count_nonzero(np.diff(indptr)))
 
 
 class _Writable(Protocol):
@@ -130,32 +334,120 @@ class ReviewGraph:
         :meth:`sqrtWeightedAveDegree <fraudar.export.greedy.sqrtWeightedAveDegree>`,
         and
         :meth:`logWeightedAveDegree <fraudar.export.greedy.logWeightedAveDegree>`.
+        A custom algorithm is called as ``algo(M)``, or as
+        ``algo(M, node_susp)`` with prior suspiciousness, on a scipy CSR
+        matrix M and returns ``((row_set, col_set), score)``; it is
+        given a matrix pair instead if decorated with
+        :meth:`acceptsMatrixPair <fraudar.export.greedy.acceptsMatrixPair>`.
         (default: logWeightedAveDegree)
+      incremental: if True, :meth:`update` re-runs detection only on the
+        neighborhood of reviews added since the previous update and on the
+        previously detected blocks. Column weights are then computed on
+        that subgraph, so the result approximates a full run.
+        (default: False)
+      max_change: the largest ratio of added reviews to all reviews for
+        which incremental detection is used; a full detection runs when
+        more reviews have been added. (default: 0.01)
+      weighting: if given, detection runs on the adjacency matrix weighted
+        by this function, e.g.
+        :func:`rating_deviation <fraudar.weighting.rating_deviation>` or
+        :func:`time_burst <fraudar.weighting.time_burst>`. The column
+        weights of algo are applied on top of the edge weights.
+        (default: None, i.e. every review counts one)
+      min_degree: if positive, reviewers and products with fewer than
+        min_degree reviews are removed repeatedly before detection, so that
+        detection runs on the min_degree-core of the graph. Nodes with few
+        reviews rarely belong to dense blocks, and removing them shrinks
+        the graph. (default: 0, i.e. no pruning)
+      partition: if True, detection runs on each connected component of the
+        graph in parallel worker processes, and the blocks with the highest
+        scores among all components are kept. (default: False)
+      processes: the number of worker processes used with partition.
+        (default: the number of CPUs)
+      graded: if True, :meth:`update` also records how long each reviewer
+        and product survives the peeling, from which
+        :meth:`suspiciousness` and :meth:`most_suspicious` rank every node.
+        algo must take a ``trace`` argument, as the algorithms of
+        :mod:`fraudar.export.greedy` do, and graded cannot be used with
+        partition. (default: False)
     """
 
-    reviewers: Final[list[Reviewer]]
+    reviewers: Final[NodeList[Reviewer]]
     """Collection of reviewers."""
-    products: Final[list[Product]]
+    products: Final[NodeList[Product]]
     """Collection of products."""
-    reviews: Final[defaultdict[Product, dict[Reviewer, float]]]
-    """Collection of reviews.
-
-    reviews is a dictionary of which key is a product and value is another
-    dictionary of which key is a reviewer and value is a rating from the
-    reviewer to the product.
-    """
+    edges: Final[EdgeStore]
+    """Array-backed storage of reviews."""
     _algo: Final[Any]
     _blocks: Final[int]
+    _incremental: Final[bool]
+    _max_change: Final[float]
+    _weighting: Final[Weighting | None]
+    _min_degree: Final[int]
+    _partition: Final[bool]
+    _processes: Final[int | None]
+    _graded: Final[bool]
+    _reviewer_priors: NDArray[np.float64] | None
+    _product_priors: NDArray[np.float64] | None
+    _last_size: int
+    """The number of edges when the previous detection ran."""
+    _last_blocks: list[Block] | None
+    """Blocks detected by the previous detection."""
+    _last_key: tuple[int, int, int] | None
+    """Fingerprint of the graph when the previous detection ran, or None if
+    the result must not be reused."""
+    _cached_matrix: tuple[int, sparse.csr_matrix] | None
+    """The number of edges and the adjacency matrix built from them."""
+    _summaries: NDArray[np.float64] | None
+    """Cached result of :meth:`summaries`."""
+    _reviews_by_product: tuple[NDArray[np.int64], NDArray[np.int64]] | None
+    """Cached result of :meth:`_review_index`."""
+    _scores: NDArray[np.float64]
+    """Anomalous scores indexed by reviewer IDs, which may be longer than
+    the number of reviewers."""
+    _suspiciousness: tuple[NDArray[np.float64], NDArray[np.float64]]
+    """Suspiciousness of reviewers and products computed by the previous
+    detection if graded is set."""
 
     def __init__(
-        self, blocks: int = 1, algo: Any = logWeightedAveDegree
+        self,
+        blocks: int = 1,
+        algo: Any = logWeightedAveDegree,
+        incremental: bool = False,
+        max_change: float = 0.01,
+        weighting: Weighting | None = None,
+        min_degree: int = 0,
+        partition: bool = False,
+        processes: int | None = None,
+        graded: bool = False,
     ) -> None:
-        self.reviewers = []
-        self.products = []
-        self.reviews = defaultdict(dict)
+        if graded and partition:
+            raise ValueError("graded cannot be used with partition")
+        if graded and not greedy.takesTrace(algo):
+            raise ValueError("graded requires algo taking a trace argument")
+        self.reviewers = NodeList(self, Reviewer)
+        self.products = NodeList(self, Product)
+        self.edges = EdgeStore()
 
         self._algo = algo
         self._blocks = blocks
+        self._incremental = incremental
+        self._max_change = max_change
+        self._weighting = weighting
+        self._min_degree = min_degree
+        self._partition = partition
+        self._processes = processes
+        self._graded = graded
+        self._last_size = 0
+        self._last_blocks = None
+        self._last_key = None
+        self._cached_matrix = None
+        self._reviewer_priors = None
+        self._product_priors = None
+        self._summaries = None
+        self._reviews_by_product = None
+        self._scores = np.zeros(0)
+        self._suspiciousness = (np.zeros(0), np.zeros(0))
 
     def new_reviewer(
         self, name: str, anomalous_score: float | None = None
@@ -168,8 +460,10 @@ class ReviewGraph:
         Returns:
           a new reviewer object.
         """
-        r = Reviewer(self, name, anomalous_score or 0)
+        r = Reviewer(self, name, node_id=len(self.reviewers))
         self.reviewers.append(r)
+        if anomalous_score is not None:
+            r.anomalous_score = anomalous_score
         return r
 
     def new_product(self, name: str) -> Product:
@@ -181,8 +475,9 @@ class ReviewGraph:
         Returns:
           a new product object.
         """
-        p = Product(self, name)
+        p = Product(self, name, len(self.products))
         self.products.append(p)
+        self._summaries = None
         return p
 
     def add_review(
@@ -202,41 +497,724 @@ class ReviewGraph:
         Returns:
           added review score.
         """
-        self.reviews[product][reviewer] = rating
+        self.edges.append(reviewer.node_id, product.node_id, rating, _time)
+        self._summaries = None
+        self._reviews_by_product = None
         return rating
 
-    def update(self) -> float:
+    def add_reviews(
+        self,
+        reviewers: Any,
+        products: Any = None,
+        ratings: Any = None,
+        times: Any = None,
+    ) -> None:
+        """Add many reviews at once.
+
+        Reviewers and products are given by names. Names which no node has
+        yet are added as new nodes, but node objects are created only when
+        they are accessed.
+
+        Args:
+          reviewers: names of the reviewers who post the reviews, or a pandas
+            DataFrame or a pyarrow Table which has ``reviewer``, ``product``,
+            ``rating`` and optionally ``time`` columns. In the latter case,
+            the other arguments must be omitted.
+          products: names of the products which receive the reviews.
+          ratings: the review scores.
+          times: times of the reviews. (default: None)
+        """
+        if products is None:
+            reviewers, products, ratings, times = _columns(reviewers)
+        self.edges.extend(
+            _lookup(self.reviewers, reviewers),
+            _lookup(self.products, products),
+            np.asarray(ratings, dtype=np.float64),
+            None if times is None else np.asarray(times, dtype=np.float64),
+        )
+        self._summaries = None
+        self._reviews_by_product = None
+
+    @classmethod
+    def from_edges(
+        cls,
+        reviewers: Any,
+        products: Any = None,
+        ratings: Any = None,
+        times: Any = None,
+        **kwargs: Any,
+    ) -> "ReviewGraph":
+        """Create a graph from arrays of reviews.
+
+        Args:
+          reviewers: names of the reviewers, or a pandas DataFrame or a
+            pyarrow Table; see :meth:`add_reviews`.
+          products: names of the products.
+          ratings: the review scores.
+          times: times of the reviews. (default: None)
+          kwargs: arguments passed to the constructor.
+
+        Returns:
+          a new graph.
+        """
+        g = cls(**kwargs)
+        g.add_reviews(reviewers, products, ratings, times)
+        return g
+
+    @property
+    def reviews(self) -> Reviews:
+        """Collection of reviews.
+
+        reviews is a mapping of which key is a product and value is a
+        dictionary of which key is a reviewer and value is a rating from the
+        reviewer to the product.
+
+        The dictionary of a product is built from :attr:`edges` when it is
+        looked up, and modifying it doesn't change this graph.
+        """
+        return Reviews(self)
+
+    def _review_index(self) -> tuple[NDArray[np.int64], NDArray[np.int64]]:
+        """Return an index of the edges grouped by products.
+
+        Returns:
+          edge indices sorted by product IDs, keeping the order of edges of
+          each product, and the offsets of each product in them.
+        """
+        if self._reviews_by_product is None:
+            products = self.edges.product_ids
+            order = np.argsort(products, kind="stable")
+            indptr = np.zeros(len(self.products) + 1, dtype=np.int64)
+            np.cumsum(
+                np.bincount(products, minlength=len(self.products)),
+                out=indptr[1:],
+            )
+            self._reviews_by_product = (order, indptr)
+        return self._reviews_by_product
+
+    def update(self, dump: _Writable | None = None) -> float:
         """Update anomalous scores by running a greedy algorithm.
 
+        The adjacency matrix is built in memory from the edge arrays
+        and handed to the detector directly. The matrix is kept between
+        updates, and only reviews added since are appended to it. If no
+        reviews, reviewers, products, or priors have been added or set since
+        the previous update, its result is reused without detection. In
+        incremental mode, detection runs only around reviews added since
+        the previous update unless too many reviews have been added.
+
+        Args:
+          dump: if given, the edge list is also written to this file-like
+            object in the text format read by
+            :meth:`readData <fraudar.export.greedy.readData>`.
+            It is meant for debugging. (default: None)
+
         Returns:
           0
         """
-        with tempfile.NamedTemporaryFile(mode="w") as fp:
-            # Store this graph to a temporal file.
-            self._store_matrix(fp)
-            fp.seek(0)
+        rows, cols = self._edges()
+        if dump is not None:
+            _write_edges(dump, rows, cols)
 
-            # Run greedy algorithm.
-            M = greedy.readData(fp.name)
-            res = greedy.detectMultiple(M, self._algo, self._blocks)
+        # Run greedy algorithm unless the graph is unchanged.
+        key = self._fingerprint()
+        if self._last_blocks is not None and key == self._last_key:
+            res = self._last_blocks
+        else:
+            M = self._matrix()
+            added = len(self.edges) - self._last_size
+            if (
+                self._incremental
+                and self._last_blocks is not None
+                and added <= self._max_change * len(self.edges)
+            ):
+                res = self._detect_incrementally(M)
+            else:
+                res = self._detect(M)
+            self._last_size = len(self.edges)
+            self._last_blocks = res
+            self._last_key = key
+            self._summaries = None
 
-            # Update anomalous scores.
-            for block in res:
-                for i in block[0][0]:
-                    self.reviewers[i].anomalous_score = 1
+        # Update anomalous scores.
+        ids = np.fromiter(
+            (i for (rows, _), _ in res for i in rows), dtype=np.int64
+        )
+        scores = self._score_buffer(len(self.reviewers))
+        if (scores[ids] != 1).any():
+            scores[ids] = 1
+            self._summaries = None
 
         return 0
 
+    def _detect_incrementally(self, M: sparse.csr_matrix) -> list[Block]:
+        """Detect blocks around reviews added since the previous detection.
+
+        The subgraph consists of the reviewers and products of the previous
+        blocks, the endpoints of the added reviews, and their neighbors.
+
+        Args:
+          M: adjacency matrix of this graph.
+
+        Returns:
+          detected blocks, of which indices are reviewer and product IDs.
+        """
+        if self._last_blocks is None or len(self.edges) == self._last_size:
+            return self._last_blocks or []
+
+        new_rows = np.unique(self.edges.reviewer_ids[self._last_size :])
+        new_cols = np.unique(self.edges.product_ids[self._last_size :])
+        rows = [new_rows, M.tocsc()[:, new_cols].indices]
+        cols = [new_cols, M[new_rows].indices]
+        for (row_set, col_set), _ in self._last_blocks:
+            rows.append(np.fromiter(row_set, dtype=np.int64))
+            cols.append(np.fromiter(col_set, dtype=np.int64))
+        row_ids = np.unique(np.concatenate(rows))
+        col_ids = np.unique(np.concatenate(cols))
+        return self._detect(M, row_ids, col_ids)
+
+    def _detect(
+        self,
+        M: sparse.csr_matrix,
+        row_ids: NDArray[np.int64] | None = None,
+        col_ids: NDArray[np.int64] | None = None,
+    ) -> list[Block]:
+        """Detect blocks in a submatrix, pruned if min_degree is set.
+
+        If partition is set, blocks are detected in each connected component
+        of the submatrix.
+
+        Args:
+          M: adjacency matrix of this graph.
+          row_ids: reviewer IDs of the submatrix. (default: every reviewer)
+          col_ids: product IDs of the submatrix. (default: every product)
+
+        Returns:
+          detected blocks, of which indices are reviewer and product IDs.
+        """
+        node_susp = self._node_susp()
+        scope = (row_ids, col_ids)
+        if row_ids is not None and col_ids is not None:
+            M = M[row_ids][:, col_ids]
+            if node_susp is not None:
+                node_susp = (node_susp[0][row_ids], node_susp[1][col_ids])
+        if self._min_degree > 0:
+            with phase("prune"):
+                M, rows, cols = greedy.coreSubsetAboveDegree(
+                    M, self._min_degree - 1, self._min_degree - 1
+                )
+            row_ids = rows if row_ids is None else row_ids[rows]
+            col_ids = cols if col_ids is None else col_ids[cols]
+            if node_susp is not None:
+                node_susp = (node_susp[0][rows], node_susp[1][cols])
+            if M.shape[0] == 0 or M.shape[1] == 0:
+                if self._graded:
+                    self._grade(M.shape, [], scope, (row_ids, col_ids))
+                return []
+
+        res: list[Block]
+        if self._partition:
+            res = parallel.detect_components(
+                M, self._algo, self._blocks, self._processes, node_susp
+            )
+        elif self._graded:
+            traces: list[greedy.Trace] = []
+            res = greedy.detectMultiple(
+                M, partial(self._algo, trace=traces), self._blocks, node_susp
+            )
+            self._grade(M.shape, traces, scope, (row_ids, col_ids))
+        else:
+            res = greedy.detectMultiple(M, self._algo, self._blocks, node_susp)
+        if row_ids is None or col_ids is None:
+            return res
+        return [
+            (
+                (
+                    set(row_ids[sorted(row_set)].tolist()),
+                    set(col_ids[sorted(col_set)].tolist()),
+                ),
+                score,
+            )
+            for (row_set, col_set), score in res
+        ]
+
+    def _grade(
+        self,
+        shape: tuple[int, int],
+        traces: Sequence[greedy.Trace],
+        scope: tuple[NDArray[np.int64] | None, NDArray[np.int64] | None],
+        ids: tuple[NDArray[np.int64] | None, NDArray[np.int64] | None],
+    ) -> None:
+        """Store suspiciousness of the nodes detection ran on.
+
+        The suspiciousness of a node is the largest one among the detected
+        blocks, computed by
+        :meth:`peelScores <fraudar.export.greedy.peelScores>`.
+
+        Args:
+          shape: shape of the matrix detection ran on.
+          traces: traces of the peeling of each block.
+          scope: reviewer and product IDs before pruning, of which
+            suspiciousness is reset to 0, or None for every node.
+          ids: reviewer and product IDs of the rows and columns of the
+            matrix, or None if they are the same as the indices.
+        """
+        rows = np.zeros(shape[0])
+        cols = np.zeros(shape[1])
+        for order, ave_scores, _ in traces:
+            r, c = greedy.peelScores(order, ave_scores, shape)
+            np.maximum(rows, r, out=rows)
+            np.maximum(cols, c, out=cols)
+
+        res = []
+        for old, size, reset, idx, value in zip(
+            self._suspiciousness,
+            (len(self.reviewers), len(self.products)),
+            scope,
+            ids,
+            (rows, cols),
+            strict=True,
+        ):
+            a = _pad(old if reset is not None else None, size)
+            if reset is not None:
+                a[reset] = 0
+            a[slice(None) if idx is None else idx] = value
+            a.flags.writeable = False
+            res.append(a)
+        self._suspiciousness = (res[0], res[1])
+
+    def suspiciousness(
+        self,
+    ) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+        """Return suspiciousness of every reviewer and product.
+
+        The suspiciousness of a node is the largest average score among the
+        sets which contained it while the previous :meth:`update` peeled the
+        graph. Members of a detected block have the score of the block, and
+        the other nodes rank by how long they survived the peeling. Nodes
+        added after the update or pruned by min_degree have 0, and in
+        incremental mode, nodes not re-detected keep their suspiciousness.
+
+        Returns:
+          read-only arrays of suspiciousness indexed by reviewer IDs and by
+          product IDs.
+        """
+        if not self._graded:
+            raise ValueError("graded must be set to rank nodes")
+        reviewers, products = self._suspiciousness
+        if len(reviewers) < len(self.reviewers) or len(products) < len(
+            self.products
+        ):
+            reviewers = _pad(reviewers, len(self.reviewers))
+            products = _pad(products, len(self.products))
+            reviewers.flags.writeable = False
+            products.flags.writeable = False
+            self._suspiciousness = (reviewers, products)
+        return reviewers, products
+
+    def most_suspicious(
+        self,
+        top: int | None = None,
+        threshold: float | None = None,
+        products: bool = False,
+    ) -> NDArray[np.int64]:
+        """Find the most suspicious reviewers or products.
+
+        Args:
+          top: if given, at most this number of nodes are returned.
+          threshold: if given, only nodes of which suspiciousness is at least
+            this value are returned.
+          products: if True, products are ranked instead of reviewers.
+            (default: False)
+
+        Returns:
+          IDs of the nodes in decreasing order of suspiciousness; nodes with
+          the same suspiciousness are ordered by IDs.
+        """
+        scores = self.suspiciousness()[1 if products else 0]
+        if threshold is None:
+            candidates = np.arange(len(scores))
+        else:
+            candidates = np.flatnonzero(scores >= threshold)
+        if top is not None and top < len(candidates):
+            if top <= 0:
+                return np.zeros(0, dtype=np.int64)
+            # keep every node tied with the top-th one before sorting.
+            kth = np.partition(scores[candidates], len(candidates) - top)[
+                len(candidates) - top
+            ]
+            candidates = candidates[scores[candidates] >= kth]
+        order = np.argsort(-scores[candidates], kind="stable")
+        res: NDArray[np.int64] = candidates[order[:top]]
+        return res
+
+    def summaries(self) -> NDArray[np.float64]:
+        """Compute summaries of ratings given to every product.
+
+        The summary of a product is the average of the latest ratings from
+        each reviewer, weighted by one minus the reviewer's anomalous score.
+        If every weight of a product is zero, the plain average is used, and
+        products without reviews have NaN. The averages are computed as
+        sparse matrix-vector products and cached until reviews, products,
+        or anomalous scores change.
+
+        Returns:
+          a read-only array of summaries indexed by product IDs.
+        """
+        if self._summaries is not None:
+            return self._summaries
+
+        shape = (len(self.products), len(self.reviewers))
+        idx = self.edges.latest(len(self.products))
+        rows = self.edges.product_ids[idx]
+        cols = self.edges.reviewer_ids[idx]
+        R = sparse.csr_matrix((self.edges.ratings[idx], (rows, cols)), shape)
+        A = sparse.csr_matrix((np.ones(len(idx)), (rows, cols)), shape)
+
+        weights = 1 - self.anomalous_scores()
+
+        total = R @ weights
+        count = A @ weights
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = np.asarray(R.sum(axis=1)).ravel() / np.bincount(
+                rows, minlength=shape[0]
+            )
+            res: NDArray[np.float64] = np.where(
+                count != 0, total / count, mean
+            )
+        res.flags.writeable = False
+        self._summaries = res
+        return res
+
+    def anomalous_scores(
+        self, kind: Literal["numpy", "arrow", "pandas"] = "numpy"
+    ) -> Any:
+        """Return anomalous scores of every reviewer without copying them.
+
+        The scores are indexed by reviewer IDs and share memory with
+        :attr:`Reviewer.anomalous_score`, so that the result reflects later
+        updates until reviewers are added, e.g.::
+
+            fraud = graph.anomalous_scores() == 1
+
+        Args:
+          kind: type of the result, i.e. numpy for a read-only NumPy array,
+            arrow for a pyarrow Array, or pandas for a pandas Series.
+            (default: numpy)
+
+        Returns:
+          the anomalous scores.
+        """
+        n = len(self.reviewers)
+        res = self._score_buffer(n)[:n]
+        res.flags.writeable = False
+        if kind == "numpy":
+            return res
+        if kind == "arrow":
+            import pyarrow as pa
+
+            return pa.array(res)
+        if kind == "pandas":
+            import pandas as pd
+
+            return pd.Series(res, name="anomalous_score", copy=False)
+        raise ValueError(f"unknown kind: {kind}")
+
+    def _score_buffer(self, size: int) -> NDArray[np.float64]:
+        """Return the array of anomalous scores, enlarging it if needed.
+
+        Args:
+          size: the number of reviewers the array must hold.
+
+        Returns:
+          the writable array, which may be longer than size.
+        """
+        if len(self._scores) < size:
+            scores = np.zeros(max(size, 2 * len(self._scores)))
+            scores[: len(self._scores)] = self._scores
+            self._scores = scores
+        return self._scores
+
+    def detect_all(
+        self,
+        configs: Sequence[tuple[Any, int]],
+        processes: int | None = None,
+    ) -> list[list[Block]]:
+        """Run several detection configurations in parallel on this graph.
+
+        The adjacency matrix is built once and shared with worker processes.
+        Anomalous scores are not updated.
+
+        Args:
+          configs: pairs of an algorithm and the number of blocks to be
+            detected, e.g. ``[(aveDegree, 1), (logWeightedAveDegree, 3)]``.
+          processes: the number of worker processes. (default: the number of
+            CPUs)
+
+        Returns:
+          detected blocks of each configuration, in the order of configs.
+          Row and column indices are reviewer and product IDs.
+        """
+        return parallel.detect_all(
+            self._matrix(), configs, processes, self._node_susp()
+        )
+
+    def set_priors(
+        self,
+        reviewers: NDArray[np.float64] | None = None,
+        products: NDArray[np.float64] | None = None,
+    ) -> None:
+        """Set prior suspiciousness of reviewers and products.
+
+        Priors, e.g. scores given by another model, are added to the
+        suspiciousness of blocks in detection. They are indexed by node IDs,
+        and nodes without priors, including nodes added later, have zero.
+        The next :meth:`update` runs a full detection.
+
+        Args:
+          reviewers: priors of reviewers. (default: None, i.e. no priors)
+          products: priors of products. (default: None, i.e. no priors)
+        """
+        for priors, nodes in (
+            (reviewers, self.reviewers),
+            (products, self.products),
+        ):
+            if priors is not None and len(priors) > len(nodes):
+                raise ValueError(
+                    f"got {len(priors)} priors for {len(nodes)} nodes"
+                )
+        self._reviewer_priors = (
+            None if reviewers is None else np.asarray(reviewers, dtype=float)
+        )
+        self._product_priors = (
+            None if products is None else np.asarray(products, dtype=float)
+        )
+        # priors change every block, so that the next update runs a full
+        # detection even in incremental mode.
+        self._last_blocks = None
+        self._last_key = None
+
+    def _node_susp(self) -> NodeSusp | None:
+        """Return priors of all nodes as the nodeSusp argument of detection.
+
+        Returns:
+          a tuple of reviewer and product priors, or None if no priors are
+          set.
+        """
+        if self._reviewer_priors is None and self._product_priors is None:
+            return None
+        return (
+            _pad(self._reviewer_priors, len(self.reviewers)),
+            _pad(self._product_priors, len(self.products)),
+        )
+
+    def _fingerprint(self) -> tuple[int, int, int]:
+        """Return a fingerprint of the graph content.
+
+        Reviews and nodes are only appended, so their numbers change
+        whenever the content changes.
+
+        Returns:
+          the numbers of reviews, reviewers, and products.
+        """
+        return len(self.edges), len(self.reviewers), len(self.products)
+
+    def _matrix(self) -> sparse.csr_matrix:
+        """Build the adjacency matrix, weighted if a weighting is set.
+
+        The matrix is cached. Without a weighting, reviews added after the
+        cached matrix was built are appended to it; with a weighting, the
+        matrix is rebuilt since weights may depend on every review.
+
+        Returns:
+          the adjacency matrix where rows are reviewers and columns are
+          products.
+        """
+        shape = (len(self.reviewers), len(self.products))
+        size = len(self.edges)
+        if self._cached_matrix is not None:
+            cached_size, M = self._cached_matrix
+            if cached_size == size:
+                M = _grow(M, shape)
+                self._cached_matrix = (size, M)
+                return M
+            if self._weighting is None:
+                with phase("build_matrix"):
+                    added = sparse.csr_matrix(
+                        (
+                            np.ones(size - cached_size, dtype=int),
+                            (
+                                self.edges.reviewer_ids[cached_size:],
+                                self.edges.product_ids[cached_size:],
+                            ),
+                        ),
+                        shape=shape,
+                    )
+                    M = _grow(M, shape) + added
+                    M.data[:] = 1
+                self._cached_matrix = (size, M)
+                return M
+
+        weights = None
+        if self._weighting is not None:
+            with phase("weighting"):
+                weights = self._weighting(self.edges)
+        with phase("build_matrix"):
+            M = self.edges.csr(shape, weights)
+        self._cached_matrix = (size, M)
+        return M
+
+    def _edges(self) -> tuple[NDArray[np.int64], NDArray[np.int64]]:
+        """Return integer indices of the edges in this graph.
+
+        Returns:
+          a tuple of row indices, i.e. reviewer IDs, and column indices,
+          i.e. product IDs.
+        """
+        return self.edges.reviewer_ids, self.edges.product_ids
+
     def _store_matrix(self, fp: _Writable) -> None:
         """Store this graph as a sparse matrix format.
 
         Args:
           fp: file-like object where the matrix to be written.
         """
-        self.reviewers.sort()
-        self.products.sort()
-        for p in self.reviews:
-            j = bisect_left(self.products, p)
-            for r in self.reviews[p]:
-                i = bisect_left(self.reviewers, r)
-                fp.write("{0} {1}\n".format(i, j))
+        _write_edges(fp, *self._edges())
+
+
+def _pad(a: NDArray[np.float64] | None, size: int) -> NDArray[np.float64]:
+    """Pad an array with zeros to the given size.
+
+    Args:
+      a: array to be padded, or None for an array of zeros.
+      size: size of the result.
+
+    Returns:
+      the padded array.
+    """
+    res = np.zeros(size)
+    if a is not None:
+        res[: len(a)] = a
+    return res
+
+
+def _grow(M: sparse.csr_matrix, shape: tuple[int, int]) -> sparse.csr_matrix:
+    """Enlarge a CSR matrix with empty rows and columns without copying.
+
+    Args:
+      M: the matrix.
+      shape: new shape, which is not smaller than the shape of M.
+
+    Returns:
+      the enlarged matrix sharing data and indices with M, or M itself if
+      the shape is the same.
+    """
+    if M.shape == shape:
+        return M
+    indptr = np.concatenate(
+        [M.indptr, np.full(shape[0] - M.shape[0], M.indptr[-1])]
+    )
+    return sparse.csr_matrix((M.data, M.indices, indptr), shape=shape)
+
+
+def _lookup(nodes: NodeList[Any], names: Any) -> NDArray[np.int64]:
+    """Find IDs of nodes by names, adding nodes for unknown names.
+
+    Names are factorized before being converted to strings, so that only
+    distinct names are converted and looked up. Categorical columns are
+    factorized by their codes.
+
+    Args:
+      nodes: collection of nodes.
+      names: names of the nodes, i.e. an array-like, a pandas Categorical,
+        or a pyarrow DictionaryArray.
+
+    Returns:
+      IDs of the nodes.
+    """
+    if hasattr(names, "categories") and hasattr(names, "codes"):
+        # pandas.Categorical, of which missing values have code -1.
+        categories, codes = np.asarray(names.categories), names.codes
+    elif hasattr(names, "dictionary") and hasattr(names, "indices"):
+        # pyarrow.DictionaryArray
+        categories = names.dictionary.to_numpy(zero_copy_only=False)
+        codes = names.indices.to_numpy() if names.null_count == 0 else [-1]
+    else:
+        categories = None
+        codes = None
+    if categories is not None and np.min(codes, initial=0) >= 0:
+        uniq, inverse = np.unique(codes, return_inverse=True)
+        return nodes.lookup(categories[uniq].astype(str))[inverse]
+
+    a = np.asarray(names)
+    if a.dtype.kind in "biuf":
+        uniq, inverse = np.unique(a, return_inverse=True)
+        return nodes.lookup(uniq.astype(str))[inverse]
+    return nodes.lookup(a.astype(str))
+
+
+def _arrow_column(column: Any) -> Any:
+    """Convert a pyarrow column to an array.
+
+    Args:
+      column: a pyarrow ChunkedArray.
+
+    Returns:
+      a DictionaryArray if the column is dictionary encoded, and a NumPy
+      array otherwise.
+    """
+    if hasattr(column.type, "index_type"):
+        return column.combine_chunks()
+    return column.to_numpy()
+
+
+def _columns(table: Any) -> tuple[Any, Any, Any, Any]:
+    """Extract review columns from a pandas DataFrame or a pyarrow Table.
+
+    Args:
+      table: a table which has ``reviewer``, ``product``, ``rating`` and
+        optionally ``time`` columns.
+
+    Returns:
+      a tuple of reviewers, products, ratings, and times, which is None if
+      the table doesn't have the time column.
+    """
+    if hasattr(table, "column_names"):
+        # pyarrow.Table
+        names = table.column_names
+        columns = [
+            _arrow_column(table.column(c)) if c in names else None
+            for c in ("reviewer", "product", "rating", "time")
+        ]
+    elif hasattr(table, "columns"):
+        # pandas.DataFrame; categorical columns are kept as Categorical.
+        columns = [
+            (
+                table[c].array
+                if hasattr(table[c], "cat")
+                else table[c].to_numpy()
+            )
+            if c in table.columns
+            else None
+            for c in ("reviewer", "product", "rating", "time")
+        ]
+    else:
+        raise TypeError(
+            "products must be given unless reviewers is a table: "
+            f"{type(table).__name__}"
+        )
+    return columns[0], columns[1], columns[2], columns[3]
+
+
+def _write_edges(
+    fp: _Writable, rows: NDArray[np.int64], cols: NDArray[np.int64]
+) -> None:
+    """Write edges as a whitespace separated text.
+
+    Args:
+      fp: file-like object where the edges to be written.
+      rows: row indices of the edges.
+      cols: column indices of the edges.
+    """
+    for i, j in zip(rows.tolist(), cols.tolist(), strict=True):
+        fp.write(f"{i} {j}\n")
@@ -0,0 +1,177 @@
+#
+#  instrument.py
+#
+#  Copyright (c) 2016-2025 Junpei Kawamoto
+#
+#  This file is part of rgmining-fraudar.
+#
+#  rgmining-fraudar is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  rgmining-fraudar is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with rgmining-fraudar. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Report wall time and memory of detection phases.
+
+Detection is split into phases, i.e. ``build_matrix``, ``prune``,
+``weighting``, ``build_trees``, ``peel``, and ``remove_block``. When a phase ends, a
+:class:`PhaseRecord` is logged to the ``fraudar`` logger at DEBUG level
+and passed to every registered sink::
+
+    with instrument.collect() as records:
+        graph.update()
+    for r in records:
+        print(r.name, r.seconds, r.rate)
+
+Peak memory is measured only while :mod:`tracemalloc` is tracing, e.g.
+after :func:`tracemalloc.start`. Phases running in worker processes of
+:mod:`fraudar.parallel` are not reported to sinks of the parent process.
+"""
+
+import logging
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import Final, NamedTuple, TypeAlias
+
+logger: Final = logging.getLogger("fraudar")
+
+
+class PhaseRecord(NamedTuple):
+    """Measurement of a finished phase."""
+
+    name: str
+    """Name of the phase."""
+    seconds: float
+    """Wall time of the phase."""
+    peak_memory: int | None
+    """Peak traced memory in bytes during the phase, or None if
+    tracemalloc is not tracing."""
+    items: int | None
+    """Number of items processed, e.g. nodes peeled, if counted."""
+
+    @property
+    def rate(self) -> float | None:
+        """Items processed per second, if counted."""
+        if self.items is None:
+            return None
+        return self.items / self.seconds if self.seconds > 0 else float("inf")
+
+
+Sink: TypeAlias = Callable[[PhaseRecord], None]
+"""A function receiving records of finished phases."""
+
+_sinks: list[Sink] = []
+
+
+class Phase:
+    """A running phase, which is returned by :func:`phase`."""
+
+    __slots__ = ("items", "_peak")
+
+    items: int | None
+    """Number of items processed, set by the code running the phase."""
+
+    _peak: int
+    """Peak traced memory of finished child phases."""
+
+    def __init__(self) -> None:
+        self.items = None
+        self._peak = 0
+
+
+_running: list[Phase] = []
+
+
+def add_sink(sink: Sink) -> None:
+    """Register a sink receiving records of every finished phase.
+
+    Args:
+      sink: function to be registered.
+    """
+    _sinks.append(sink)
+
+
+def remove_sink(sink: Sink) -> None:
+    """Unregister a sink.
+
+    Args:
+      sink: function to be unregistered.
+    """
+    _sinks.remove(sink)
+
+
+@contextmanager
+def collect() -> Iterator[list[PhaseRecord]]:
+    """Collect records of phases finished in the ``with`` block.
+
+    Yields:
+      a list to which the records are appended.
+    """
+    records: list[PhaseRecord] = []
+    add_sink(records.append)
+    try:
+        yield records
+    finally:
+        remove_sink(records.append)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[Phase]:
+    """Measure a phase running in the ``with`` block.
+
+    Args:
+      name: name of the phase.
+
+    Yields:
+      the running phase, whose ``items`` can be set to report a rate.
+    """
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        # keep the peak so far for the enclosing phase before resetting.
+        if _running:
+            _running[-1]._peak = max(
+                _running[-1]._peak, tracemalloc.get_traced_memory()[1]
+            )
+        tracemalloc.reset_peak()
+    p = Phase()
+    _running.append(p)
+    start = time.perf_counter()
+    try:
+        yield p
+    finally:
+        seconds = time.perf_counter() - start
+        _running.pop()
+        peak = None
+        if tracing and tracemalloc.is_tracing():
+            peak = max(p._peak, tracemalloc.get_traced_memory()[1])
+            if _running:
+                _running[-1]._peak = max(_running[-1]._peak, peak)
+    # only phases finished without an exception are reported.
+    _report(PhaseRecord(name, seconds, peak, p.items))
+
+
+def _report(record: PhaseRecord) -> None:
+    """Log a record and pass it to the sinks.
+
+    Args:
+      record: record of a finished phase.
+    """
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "%s: %.3f s, peak memory %s bytes, %s items/s",
+            record.name,
+            record.seconds,
+            record.peak_memory,
+            record.rate,
+        )
+    for sink in _sinks:
+        sink(record)
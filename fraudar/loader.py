@@ -0,0 +1,316 @@
+#
+#  loader.py
+#
+#  Copyright (c) 2016-2025 Junpei Kawamoto
+#
+#  This file is part of rgmining-fraudar.
+#
+#  rgmining-fraudar is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  rgmining-fraudar is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with rgmining-fraudar. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Load edge lists from files in chunks.
+
+Edges are read in chunks of rows and parsed by NumPy, so that only one
+chunk of text is held in memory at a time. Supported formats are
+
+* text files separated by whitespace, commas (``.csv``) or tabs
+  (``.tsv``), optionally compressed with gzip (``.gz``) or zstd
+  (``.zst``),
+* Parquet files (``.parquet``), which requires pyarrow,
+* NumPy ``.npz`` archives.
+
+The loaded arrays follow the contract of
+:meth:`listToSparseMatrix <fraudar.export.greedy.listToSparseMatrix>`::
+
+    M = greedy.listToSparseMatrix(*load_edges("edges.csv.gz", header=True))
+"""
+
+import gzip
+import importlib
+import io
+import os
+from collections.abc import Hashable, Iterator, Sequence
+from itertools import islice
+from pathlib import Path
+from typing import IO, Any, Final, Literal, TypeAlias
+
+import numpy as np
+from numpy.typing import DTypeLike, NDArray
+
+DEFAULT_CHUNK_SIZE: Final = 1 << 20
+"""Default number of rows parsed at once."""
+
+Format: TypeAlias = Literal["text", "parquet", "npz"]
+"""Supported file formats."""
+
+Column: TypeAlias = int | str
+"""Index or name of a column."""
+
+_DELIMITERS: Final = {".csv": ",", ".tsv": "\t"}
+_COMPRESSIONS: Final = (".gz", ".zst", ".zstd")
+
+
+class IdMap:
+    """Streaming dictionary assigning dense integer IDs to names.
+
+    IDs are assigned in the order names first appear, so that the same map
+    can be shared by several chunks or files.
+    """
+
+    __slots__ = ("_ids", "names")
+
+    _ids: dict[Hashable, int]
+    names: list[Hashable]
+    """Names indexed by their IDs."""
+
+    def __init__(self) -> None:
+        self._ids = {}
+        self.names = []
+
+    def __len__(self) -> int:
+        """Returns the number of names."""
+        return len(self.names)
+
+    def map(self, keys: NDArray[Any]) -> NDArray[np.int64]:
+        """Map names to their IDs, assigning new IDs to unknown names.
+
+        Args:
+          keys: names to be mapped.
+
+        Returns:
+          IDs of the names.
+        """
+        ids = self._ids
+        names = self.names
+        try:
+            uniq, first, inverse = np.unique(
+                keys, return_index=True, return_inverse=True
+            )
+        except TypeError:
+            # Names which cannot be sorted are mapped one by one.
+            uniq, first, inverse = keys, np.arange(len(keys)), None
+        # Only distinct names go through the dictionary, in the order they
+        # first appear so that new IDs are assigned as the names appear.
+        order = np.argsort(first, kind="stable")
+        res = np.empty(len(uniq), dtype=np.int64)
+        for k, key in zip(order.tolist(), uniq[order].tolist()):
+            i = ids.get(key)
+            if i is None:
+                i = ids[key] = len(names)
+                names.append(key)
+            res[k] = i
+        return res if inverse is None else res[inverse.reshape(-1)]
+
+
+def iter_edges(
+    path: str | os.PathLike[str],
+    columns: tuple[Column, Column] = (0, 1),
+    *,
+    fmt: Format | None = None,
+    delimiter: str | None = None,
+    header: bool = False,
+    dtype: DTypeLike = np.int64,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[tuple[NDArray[Any], NDArray[Any]]]:
+    """Read the source and destination columns of an edge list in chunks.
+
+    Args:
+      path: path to the file.
+      columns: indices or names of the source and destination columns.
+        Names of text columns require header. (default: the first two
+        columns)
+      fmt: format of the file. (default: inferred from the suffix)
+      delimiter: column separator of a text file. (default: inferred from
+        the suffix, i.e. comma for .csv, tab for .tsv, and whitespace
+        otherwise)
+      header: if True, the first line of a text file has column names.
+      dtype: type of text columns, e.g. str for string IDs.
+        (default: int64)
+      chunk_size: number of rows in a chunk.
+
+    Yields:
+      pairs of source and destination arrays of each chunk.
+    """
+    path = Path(path)
+    if fmt is None:
+        fmt = _infer_format(path)
+    if fmt == "parquet":
+        yield from _iter_parquet(path, columns, chunk_size)
+    elif fmt == "npz":
+        yield from _iter_npz(path, columns, chunk_size)
+    elif fmt == "text":
+        yield from _iter_text(
+            path, columns, delimiter, header, dtype, chunk_size
+        )
+    else:
+        raise ValueError(f"unknown format: {fmt}")
+
+
+def load_edges(
+    path: str | os.PathLike[str],
+    columns: tuple[Column, Column] = (0, 1),
+    *,
+    reviewers: IdMap | None = None,
+    products: IdMap | None = None,
+    **kwargs: Any,
+) -> tuple[NDArray[np.int64], NDArray[np.int64]]:
+    """Load an edge list as integer arrays.
+
+    Without ID maps, both columns must be integer IDs. With ID maps,
+    columns are read as names and mapped to dense IDs chunk by chunk.
+
+    Args:
+      path: path to the file.
+      columns: indices or names of the reviewer and product columns.
+      reviewers: map assigning IDs to reviewer names. (default: None)
+      products: map assigning IDs to product names. (default: None)
+      kwargs: other options passed to :func:`iter_edges`.
+
+    Returns:
+      a tuple of the reviewer IDs and the product IDs of the edges.
+    """
+    if reviewers is not None or products is not None:
+        kwargs.setdefault("dtype", str)
+    sources = []
+    dests = []
+    for src, dst in iter_edges(path, columns, **kwargs):
+        sources.append(
+            reviewers.map(src)
+            if reviewers is not None
+            else src.astype(np.int64, copy=False)
+        )
+        dests.append(
+            products.map(dst)
+            if products is not None
+            else dst.astype(np.int64, copy=False)
+        )
+    if not sources:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(sources), np.concatenate(dests)
+
+
+def _infer_format(path: Path) -> Format:
+    """Infer the format of a file from its suffix."""
+    suffix = path.suffix.lower()
+    if suffix == ".parquet":
+        return "parquet"
+    if suffix == ".npz":
+        return "npz"
+    return "text"
+
+
+def _open_text(path: Path) -> IO[str]:
+    """Open a text file, decompressing it if needed."""
+    suffix = path.suffix.lower()
+    if suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8")
+    if suffix in (".zst", ".zstd"):
+        try:
+            zstd = importlib.import_module("compression.zstd")
+        except ImportError:
+            # Python < 3.14 needs the zstandard package.
+            zstandard = importlib.import_module("zstandard")
+            return io.TextIOWrapper(
+                zstandard.ZstdDecompressor().stream_reader(open(path, "rb")),
+                encoding="utf-8",
+            )
+        return zstd.open(path, "rt", encoding="utf-8")  # type: ignore[no-any-return]
+    return open(path, encoding="utf-8")
+
+
+def _iter_text(
+    path: Path,
+    columns: tuple[Column, Column],
+    delimiter: str | None,
+    header: bool,
+    dtype: DTypeLike,
+    chunk_size: int,
+) -> Iterator[tuple[NDArray[Any], NDArray[Any]]]:
+    """Read columns of a text file in chunks."""
+    name = path.name.lower()
+    for suffix in _COMPRESSIONS:
+        name = name.removesuffix(suffix)
+    if delimiter is None:
+        delimiter = _DELIMITERS.get(Path(name).suffix)
+
+    with _open_text(path) as fp:
+        names: list[str] = []
+        if header:
+            names = [s.strip() for s in fp.readline().split(delimiter)]
+        usecols = tuple(_column_index(c, names) for c in columns)
+        while lines := list(islice(fp, chunk_size)):
+            chunk = np.loadtxt(
+                lines,
+                dtype=dtype,
+                delimiter=delimiter,
+                usecols=usecols,
+                ndmin=2,
+                quotechar='"' if delimiter is not None else None,
+            )
+            yield chunk[:, 0], chunk[:, 1]
+
+
+def _iter_parquet(
+    path: Path, columns: tuple[Column, Column], chunk_size: int
+) -> Iterator[tuple[NDArray[Any], NDArray[Any]]]:
+    """Read columns of a Parquet file in chunks."""
+    pq = importlib.import_module("pyarrow.parquet")
+    with pq.ParquetFile(path) as f:
+        names = f.schema_arrow.names
+        selected = [names[_column_index(c, names)] for c in columns]
+        for batch in f.iter_batches(batch_size=chunk_size, columns=selected):
+            yield (
+                batch.column(0).to_numpy(zero_copy_only=False),
+                batch.column(1).to_numpy(zero_copy_only=False),
+            )
+
+
+def _iter_npz(
+    path: Path, columns: tuple[Column, Column], chunk_size: int
+) -> Iterator[tuple[NDArray[Any], NDArray[Any]]]:
+    """Read arrays of an .npz archive in chunks.
+
+    An archive may have one 2-D array, whose columns are selected, or one
+    1-D array per column.
+    """
+    with np.load(path) as z:
+        if len(z.files) == 1:
+            a = z[z.files[0]]
+            if a.ndim == 2:
+                src, dst = (a[:, _column_index(c, [])] for c in columns)
+            else:
+                raise ValueError("an archive with one array must be 2-D")
+        else:
+            src, dst = (
+                z[z.files[c] if isinstance(c, int) else c] for c in columns
+            )
+    for start in range(0, len(src), chunk_size):
+        yield src[start : start + chunk_size], dst[start : start + chunk_size]
+
+
+def _column_index(column: Column, names: Sequence[str]) -> int:
+    """Resolve a column name to its index.
+
+    Args:
+      column: index or name of a column.
+      names: column names.
+
+    Returns:
+      index of the column.
+    """
+    if isinstance(column, int):
+        return column
+    try:
+        return names.index(column)
+    except ValueError:
+        raise ValueError(f"unknown column: {column}") from None
@@ -0,0 +1,618 @@
+#
+#  parallel.py
+#
+#  Copyright (c) 2016-2025 Junpei Kawamoto
+#
+#  This file is part of rgmining-fraudar.
+#
+#  rgmining-fraudar is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  rgmining-fraudar is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with rgmining-fraudar. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Run detection in parallel over a shared matrix.
+
+Several detection configurations can run at once with :func:`detect_all`,
+and one configuration can run on each connected component at once with
+:func:`detect_components`. The matrix is copied once into shared memory,
+and worker processes map it without receiving a pickled copy.
+"""
+
+import heapq
+import os
+import sys
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from types import TracebackType
+from typing import Any, Final, NamedTuple, TypeAlias
+
+import numpy as np
+from numpy.typing import NDArray
+from scipy import sparse
+from scipy.sparse import csgraph
+
+from fraudar.export import greedy
+
+Block: TypeAlias = tuple[tuple[set[int], set[int]], float]
+"""A detected block, i.e. ((row indices, column indices), score)."""
+
+NodeSusp: TypeAlias = tuple[NDArray[np.float64], NDArray[np.float64]]
+"""Prior suspiciousness of rows and columns."""
+
+Component: TypeAlias = tuple[NDArray[np.int64], NDArray[np.int64]]
+"""Row and column indices of a connected component."""
+
+BATCH_EDGES: Final = 1 << 16
+"""Components with fewer edges are detected together, and sent to workers
+in batches of about this many edges."""
+
+
+class _ArraySpec(NamedTuple):
+    """Location of an array in shared memory."""
+
+    name: str
+    shape: tuple[int, ...]
+    dtype: str
+
+
+class SharedMatrixHandle(NamedTuple):
+    """Picklable reference to a :class:`SharedMatrix`."""
+
+    shape: tuple[int, int]
+    data: _ArraySpec
+    indices: _ArraySpec
+    indptr: _ArraySpec
+
+
+class SharedMatrix:
+    """A CSR matrix copied into shared memory.
+
+    The shared memory is released when :meth:`close` is called or the
+    ``with`` block exits.
+
+    Args:
+      M: sparse matrix to be shared.
+    """
+
+    handle: SharedMatrixHandle
+    """Reference passed to other processes to attach this matrix."""
+
+    _blocks: list[SharedMemory]
+
+    def __init__(self, M: sparse.spmatrix) -> None:
+        M = sparse.csr_matrix(M)
+        self._blocks = []
+        self.handle = SharedMatrixHandle(
+            M.shape,
+            self._share(M.data),
+            self._share(M.indices),
+            self._share(M.indptr),
+        )
+
+    def _share(self, a: NDArray[Any]) -> _ArraySpec:
+        """Copy an array into a new shared memory block.
+
+        Args:
+          a: array to be copied.
+
+        Returns:
+          location of the copied array.
+        """
+        shm = SharedMemory(create=True, size=max(a.nbytes, 1))
+        self._blocks.append(shm)
+        np.ndarray(a.shape, dtype=a.dtype, buffer=shm.buf)[:] = a
+        return _ArraySpec(shm.name, a.shape, a.dtype.str)
+
+    def close(self) -> None:
+        """Release the shared memory."""
+        for shm in self._blocks:
+            shm.close()
+            shm.unlink()
+        self._blocks.clear()
+
+    def __enter__(self) -> "SharedMatrix":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+def attach(
+    handle: SharedMatrixHandle,
+) -> tuple[sparse.csr_matrix, list[SharedMemory]]:
+    """Attach a matrix shared by another process without copying it.
+
+    Args:
+      handle: reference to the shared matrix.
+
+    Returns:
+      a tuple of the matrix and the shared memory blocks backing it, which
+      must be kept alive while the matrix is used.
+    """
+    blocks = []
+    arrays = []
+    for spec in (handle.data, handle.indices, handle.indptr):
+        shm = _open(spec.name)
+        blocks.append(shm)
+        arrays.append(
+            np.ndarray(spec.shape, dtype=np.dtype(spec.dtype), buffer=shm.buf)
+        )
+    M = sparse.csr_matrix(tuple(arrays), shape=handle.shape, copy=False)
+    return M, blocks
+
+
+def _open(name: str) -> SharedMemory:
+    """Open an existing shared memory block owned by another process.
+
+    Args:
+      name: name of the block.
+
+    Returns:
+      the opened block.
+    """
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name=name, track=False)
+    # Worker processes share the resource tracker of the owner, so
+    # registering the block again is harmless.
+    return SharedMemory(name=name)
+
+
+_worker_matrix: sparse.csr_matrix | None = None
+_worker_blocks: list[SharedMemory] = []
+_worker_node_susp: NodeSusp | None = None
+
+
+def _init_worker(
+    handle: SharedMatrixHandle, node_susp: NodeSusp | None
+) -> None:
+    """Attach the shared matrix once per worker process."""
+    global _worker_matrix, _worker_blocks, _worker_node_susp
+    _worker_matrix, _worker_blocks = attach(handle)
+    _worker_node_susp = node_susp
+
+
+def _detect(algo: Any, blocks: int) -> list[Block]:
+    """Run a configuration on the matrix attached to this worker."""
+    res: list[Block] = greedy.detectMultiple(
+        _worker_matrix, algo, blocks, _worker_node_susp
+    )
+    return res
+
+
+def _detect_batch(
+    algo: Any, blocks: int, batch: list[Component]
+) -> list[Block]:
+    """Run a configuration on components of the matrix attached to this
+    worker."""
+    return detect_each(_worker_matrix, algo, blocks, batch, _worker_node_susp)
+
+
+def detect_all(
+    M: sparse.spmatrix,
+    configs: Sequence[tuple[Any, int]],
+    processes: int | None = None,
+    node_susp: NodeSusp | None = None,
+) -> list[list[Block]]:
+    """Run several detection configurations in parallel.
+
+    Args:
+      M: sparse matrix where rows are reviewers and columns are products.
+      configs: pairs of an algorithm, e.g.
+        :meth:`aveDegree <fraudar.export.greedy.aveDegree>`, and the number
+        of blocks to be detected. Algorithms must be picklable, i.e.
+        module-level functions or partials of them.
+      processes: the number of worker processes. (default: the number of
+        CPUs)
+      node_susp: prior suspiciousness of the rows and columns, sent to each
+        worker once. (default: None)
+
+    Returns:
+      detected blocks of each configuration, in the order of configs.
+    """
+    with (
+        SharedMatrix(M) as shared,
+        ProcessPoolExecutor(
+            processes,
+            initializer=_init_worker,
+            initargs=(shared.handle, node_susp),
+        ) as pool,
+    ):
+        futures = [
+            pool.submit(_detect, algo, blocks) for algo, blocks in configs
+        ]
+        return [f.result() for f in futures]
+
+
+def components(M: sparse.spmatrix) -> list[Component]:
+    """Find connected components of a bipartite graph.
+
+    Rows and columns without edges are not included in any component.
+
+    Args:
+      M: sparse matrix where rows are reviewers and columns are products.
+
+    Returns:
+      row and column indices of the components, in descending order of
+      their numbers of edges.
+    """
+    M = sparse.csr_matrix(M)
+    m, n = M.shape
+    adj = sparse.bmat([[None, M], [M.T, None]], format="csr")
+    num, labels = csgraph.connected_components(adj, directed=False)
+    edges = np.bincount(
+        labels[np.repeat(np.arange(m), np.diff(M.indptr))], minlength=num
+    )
+
+    # node indices sorted by labels, where rows come before columns in
+    # each label; columns are shifted to their own indices.
+    nodes = np.argsort(labels, kind="stable")
+    nodes[nodes >= m] -= m
+    ends = np.cumsum(np.bincount(labels, minlength=num))
+    row_ends = ends - np.bincount(labels[m:], minlength=num)
+    starts = ends - np.bincount(labels, minlength=num)
+    res = []
+    for label in np.argsort(-edges, kind="stable").tolist():
+        if edges[label] == 0:
+            break
+        res.append(
+            (
+                nodes[starts[label] : row_ends[label]],
+                nodes[row_ends[label] : ends[label]],
+            )
+        )
+    return res
+
+
+def detect_each(
+    M: sparse.spmatrix,
+    algo: Any,
+    blocks: int,
+    comps: Sequence[Component],
+    node_susp: NodeSusp | None = None,
+) -> list[Block]:
+    """Run a configuration on each component and merge the blocks.
+
+    If algo accepts a matrix pair and takes a ``trace`` argument, e.g. the
+    algorithms of :mod:`fraudar.export.greedy`, components with fewer than
+    :data:`BATCH_EDGES` edges are peeled together by
+    :func:`detect_together`.
+
+    Args:
+      M: sparse matrix where rows are reviewers and columns are products.
+      algo: detection algorithm.
+      blocks: the number of blocks to be detected.
+      comps: components of the matrix.
+      node_susp: prior suspiciousness of the rows and columns.
+        (default: None)
+
+    Returns:
+      the blocks with the highest scores, of which indices are rows and
+      columns of M.
+    """
+    M = sparse.csr_matrix(M)
+    together = _batchable(algo)
+    small: list[Component] = []
+    res: list[Block] = []
+    for (rows, cols), nnz in zip(comps, _edge_counts(M, comps), strict=True):
+        if together and nnz < BATCH_EDGES:
+            small.append((rows, cols))
+            continue
+        susp = None
+        if node_susp is not None:
+            susp = (node_susp[0][rows], node_susp[1][cols])
+        for (row_set, col_set), score in greedy.detectMultiple(
+            M[rows][:, cols], algo, blocks, susp
+        ):
+            res.append(
+                (
+                    (
+                        set(rows[sorted(row_set)].tolist()),
+                        set(cols[sorted(col_set)].tolist()),
+                    ),
+                    score,
+                )
+            )
+    if small:
+        res.extend(detect_together(M, algo, blocks, small, node_susp))
+    return heapq.nlargest(blocks, res, key=lambda b: b[1])
+
+
+def detect_together(
+    M: sparse.spmatrix,
+    algo: Any,
+    blocks: int,
+    comps: Sequence[Component],
+    node_susp: NodeSusp | None = None,
+) -> list[Block]:
+    """Run a configuration on many components with one peeling per block.
+
+    The components are put into one block diagonal matrix. Greedy peeling
+    removes a node with the smallest degree, which depends only on its own
+    component, so the removals in each component come in the same order
+    as when the component is peeled alone. The best block of every
+    component is found from the trace of the peeling, and the blocks of
+    all components are removed before peeling for the next block. The
+    results are the same as :func:`detect_each` up to rounding errors,
+    except that the batch engine compares degrees with the average degree
+    of all the components.
+
+    Args:
+      M: sparse matrix where rows are reviewers and columns are products.
+      algo: detection algorithm, which accepts a matrix pair and takes a
+        ``trace`` argument.
+      blocks: the number of blocks to be detected in each component.
+      comps: components of the matrix.
+      node_susp: prior suspiciousness of the rows and columns.
+        (default: None)
+
+    Returns:
+      the blocks with the highest scores, of which indices are rows and
+      columns of M.
+    """
+    rows = np.concatenate([r for r, _ in comps])
+    cols = np.concatenate([c for _, c in comps])
+    m = len(rows)
+    num_rows = np.array([len(r) for r, _ in comps])
+    num_cols = np.array([len(c) for _, c in comps])
+    ids = np.arange(len(comps))
+    labels = np.concatenate(
+        [np.repeat(ids, num_rows), np.repeat(ids, num_cols)]
+    )
+    susp = None
+    prior = np.zeros(len(labels))
+    if node_susp is not None:
+        susp = (node_susp[0][rows], node_susp[1][cols])
+        prior = np.concatenate(susp)
+
+    # components are disjoint, so that the submatrix is block diagonal.
+    Mcur = greedy.MatrixPair(sparse.csr_matrix(M)[rows][:, cols])
+    scores = np.empty((len(comps), blocks))
+    members = np.empty((blocks, len(labels)), dtype=bool)
+    for b in range(blocks):
+        traces: list[greedy.Trace] = []
+        algo(Mcur, susp, trace=traces)
+        order, _, deltas = traces[0]
+        members[b], scores[:, b] = _split_peel(
+            order, deltas, labels, prior, num_rows, num_cols
+        )
+        if b + 1 < blocks:
+            greedy.removeBlock(
+                Mcur,
+                np.flatnonzero(members[b, :m]),
+                np.flatnonzero(members[b, m:]),
+            )
+
+    # ties are broken by components and then blocks, as in detect_each.
+    row_ends = np.cumsum(num_rows)
+    col_ends = np.cumsum(num_cols)
+    res: list[Block] = []
+    for i in np.argsort(-scores.ravel(), kind="stable")[:blocks].tolist():
+        c, b = divmod(i, blocks)
+        r = slice(row_ends[c] - num_rows[c], row_ends[c])
+        k = slice(col_ends[c] - num_cols[c], col_ends[c])
+        res.append(
+            (
+                (
+                    set(rows[r][members[b, :m][r]].tolist()),
+                    set(cols[k][members[b, m:][k]].tolist()),
+                ),
+                float(scores[c, b]),
+            )
+        )
+    return res
+
+
+def _split_peel(
+    order: NDArray[np.int64],
+    deltas: NDArray[np.float64],
+    labels: NDArray[np.int64],
+    prior: NDArray[np.float64],
+    num_rows: NDArray[np.int64],
+    num_cols: NDArray[np.int64],
+) -> tuple[NDArray[np.bool_], NDArray[np.float64]]:
+    """Find the best block of each component from a peeling of all of them.
+
+    Args:
+      order: removal order of the peeling, where row i is i and column j is
+        m + j.
+      deltas: the decrease of the score by each removal.
+      labels: component of each row and column.
+      prior: prior suspiciousness of each row and column.
+      num_rows: the number of rows of each component.
+      num_cols: the number of columns of each component.
+
+    Returns:
+      a mask of the rows and columns in the blocks, and the average score
+      of the block of each component.
+    """
+    k = len(num_rows)
+    m = int(num_rows.sum())
+    size = num_rows + num_cols
+
+    # removals grouped by components, keeping the order in each component.
+    idx = np.argsort(labels[order], kind="stable")
+    nodes = order[idx]
+    deltas = deltas[idx]
+    lab = labels[nodes]
+    starts = np.searchsorted(lab, np.arange(k))
+    pos = np.arange(len(lab)) - starts[lab]
+
+    # the initial score is every decrease plus priors of nodes never removed.
+    remained = np.ones(len(labels), dtype=bool)
+    remained[nodes] = False
+    initial = np.bincount(lab, weights=deltas, minlength=k) + np.bincount(
+        labels[remained], weights=prior[remained], minlength=k
+    )
+
+    # peeling of a component alone stops when its rows or columns run out.
+    is_row = nodes < m
+    done = (_group_cumsum(is_row, starts, lab) == num_rows[lab]) | (
+        _group_cumsum(~is_row, starts, lab) == num_cols[lab]
+    )
+    stop = np.zeros(k, dtype=np.int64)
+    first_lab, first = np.unique(lab[done], return_index=True)
+    stop[first_lab] = pos[done][first] + 1
+    valid = pos < stop[lab]
+
+    ave = np.where(
+        valid,
+        (initial[lab] - _group_cumsum(deltas, starts, lab))
+        / np.maximum(size[lab] - pos - 1, 1),
+        -np.inf,
+    )
+    best = np.maximum.reduceat(ave, starts[stop > 0]) if len(ave) else ave
+    best_ave = np.full(k, -np.inf)
+    best_ave[stop > 0] = best
+    ave0 = initial / size
+    better = best_ave > ave0
+
+    # the best block starts after the first removal giving the best score.
+    hit = valid & better[lab] & (ave == best_ave[lab])
+    best_lab, first = np.unique(lab[hit], return_index=True)
+    num_removed = np.zeros(k, dtype=np.int64)
+    num_removed[best_lab] = pos[hit][first] + 1
+
+    members = np.ones(len(labels), dtype=bool)
+    members[nodes[pos < num_removed[lab]]] = False
+    return members, np.where(better, best_ave, ave0)
+
+
+def _group_cumsum(
+    a: NDArray[Any], starts: NDArray[np.int64], lab: NDArray[np.int64]
+) -> NDArray[Any]:
+    """Compute cumulative sums restarting at each group.
+
+    Args:
+      a: values sorted by groups.
+      starts: start position of each group.
+      lab: group of each value.
+
+    Returns:
+      the cumulative sums within groups.
+    """
+    total = np.concatenate([[0], np.cumsum(a)])
+    res: NDArray[Any] = total[1:] - total[starts][lab]
+    return res
+
+
+def _edge_counts(
+    M: sparse.csr_matrix, comps: Sequence[Component]
+) -> list[int]:
+    """Count edges of each component.
+
+    Args:
+      M: sparse matrix where rows are reviewers and columns are products.
+      comps: components of the matrix.
+
+    Returns:
+      the numbers of edges of the components.
+    """
+    if not comps:
+        return []
+    degrees = np.diff(M.indptr)
+    lens = [len(rows) for rows, _ in comps]
+    res: list[int] = (
+        np.bincount(
+            np.repeat(np.arange(len(comps)), lens),
+            weights=degrees[np.concatenate([rows for rows, _ in comps])],
+            minlength=len(comps),
+        )
+        .astype(np.int64)
+        .tolist()
+    )
+    return res
+
+
+def _batchable(algo: Any) -> bool:
+    """Check if an algorithm can run on components together.
+
+    Args:
+      algo: detection algorithm.
+
+    Returns:
+      True if algo accepts a matrix pair and can be called with ``trace``.
+    """
+    return bool(greedy.takesMatrixPair(algo) and greedy.takesTrace(algo))
+
+
+def detect_components(
+    M: sparse.spmatrix,
+    algo: Any,
+    blocks: int,
+    processes: int | None = None,
+    node_susp: NodeSusp | None = None,
+) -> list[Block]:
+    """Run a configuration on each connected component in parallel.
+
+    Dense blocks never span components, so the top blocks of each
+    component are detected independently and the ones with the highest
+    scores are returned. Each component with at least
+    :data:`BATCH_EDGES` edges is sent to a worker alone, and smaller
+    components are sent together and detected by one peeling per block;
+    see :func:`detect_each`.
+
+    Args:
+      M: sparse matrix where rows are reviewers and columns are products.
+      algo: detection algorithm, which must be picklable.
+      blocks: the number of blocks to be detected.
+      processes: the number of worker processes. (default: the number of
+        CPUs)
+      node_susp: prior suspiciousness of the rows and columns.
+        (default: None)
+
+    Returns:
+      detected blocks in descending order of their scores.
+    """
+    comps = components(M)
+    if not comps:
+        return []
+
+    batches: list[list[Component]] = []
+    small: list[Component] = []
+    size = 0
+    for (rows, cols), nnz in zip(
+        comps, _edge_counts(sparse.csr_matrix(M), comps), strict=True
+    ):
+        if nnz >= BATCH_EDGES:
+            batches.append([(rows, cols)])
+            continue
+        small.append((rows, cols))
+        size += nnz
+        if size >= BATCH_EDGES:
+            batches.append(small)
+            small = []
+            size = 0
+    if small:
+        batches.append(small)
+
+    if len(batches) == 1 or processes == 1:
+        return detect_each(M, algo, blocks, comps, node_susp)
+
+    with (
+        SharedMatrix(M) as shared,
+        ProcessPoolExecutor(
+            min(processes or os.cpu_count() or 1, len(batches)),
+            initializer=_init_worker,
+            initargs=(shared.handle, node_susp),
+        ) as pool,
+    ):
+        futures = [
+            pool.submit(_detect_batch, algo, blocks, batch)
+            for batch in batches
+        ]
+        res = [b for f in futures for b in f.result()]
+    return heapq.nlargest(blocks, res, key=lambda b: b[1])
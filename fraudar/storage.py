@@ -0,0 +1,263 @@
+#
+#  storage.py
+#
+#  Copyright (c) 2016-2025 Junpei Kawamoto
+#
+#  This file is part of rgmining-fraudar.
+#
+#  rgmining-fraudar is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  rgmining-fraudar is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with rgmining-fraudar. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Provide an array-backed storage of review edges."""
+
+from typing import Final, TypeVar
+
+import numpy as np
+from numpy.typing import NDArray
+from scipy import sparse
+
+_INITIAL_CAPACITY: Final = 1024
+
+_T = TypeVar("_T", bound=np.generic)
+
+
+class EdgeStore:
+    """Growable NumPy arrays storing edges of a review graph.
+
+    Each edge consists of a reviewer ID, a product ID, a rating, and an
+    optional time. IDs are dense integers assigned by the graph. The time
+    array is allocated when the first edge with a time is appended, and
+    missing times are stored as NaN.
+
+    Args:
+      capacity: initial number of edges which can be stored without
+        reallocation.
+    """
+
+    __slots__ = ("_reviewer", "_product", "_rating", "_time", "_size")
+
+    _reviewer: NDArray[np.int64]
+    _product: NDArray[np.int64]
+    _rating: NDArray[np.float64]
+    _time: NDArray[np.float64] | None
+    _size: int
+
+    def __init__(self, capacity: int = _INITIAL_CAPACITY) -> None:
+        self._reviewer = np.empty(capacity, dtype=np.int64)
+        self._product = np.empty(capacity, dtype=np.int64)
+        self._rating = np.empty(capacity, dtype=np.float64)
+        self._time = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        """Returns the number of stored edges."""
+        return self._size
+
+    @property
+    def reviewer_ids(self) -> NDArray[np.int64]:
+        """Reviewer IDs of the stored edges."""
+        return self._reviewer[: self._size]
+
+    @property
+    def product_ids(self) -> NDArray[np.int64]:
+        """Product IDs of the stored edges."""
+        return self._product[: self._size]
+
+    @property
+    def ratings(self) -> NDArray[np.float64]:
+        """Ratings of the stored edges."""
+        return self._rating[: self._size]
+
+    @property
+    def times(self) -> NDArray[np.float64] | None:
+        """Times of the stored edges, or None if no edge has a time."""
+        if self._time is None:
+            return None
+        return self._time[: self._size]
+
+    def append(
+        self,
+        reviewer_id: int,
+        product_id: int,
+        rating: float,
+        time: float | None = None,
+    ) -> None:
+        """Append an edge.
+
+        Args:
+          reviewer_id: ID of the reviewer.
+          product_id: ID of the product.
+          rating: the review score.
+          time: time of the review. (default: None)
+        """
+        if self._size == len(self._reviewer):
+            self._reserve(2 * self._size)
+        i = self._size
+        self._reviewer[i] = reviewer_id
+        self._product[i] = product_id
+        self._rating[i] = rating
+        if time is not None:
+            if self._time is None:
+                self._time = np.full(len(self._reviewer), np.nan)
+            self._time[i] = time
+        elif self._time is not None:
+            self._time[i] = np.nan
+        self._size += 1
+
+    def extend(
+        self,
+        reviewer_ids: NDArray[np.int64],
+        product_ids: NDArray[np.int64],
+        ratings: NDArray[np.float64],
+        times: NDArray[np.float64] | None = None,
+    ) -> None:
+        """Append many edges at once.
+
+        Args:
+          reviewer_ids: IDs of the reviewers.
+          product_ids: IDs of the products.
+          ratings: the review scores.
+          times: times of the reviews. (default: None)
+        """
+        size = self._size + len(reviewer_ids)
+        if size > len(self._reviewer):
+            self._reserve(max(size, 2 * self._size))
+        self._reviewer[self._size : size] = reviewer_ids
+        self._product[self._size : size] = product_ids
+        self._rating[self._size : size] = ratings
+        if times is not None:
+            if self._time is None:
+                self._time = np.full(len(self._reviewer), np.nan)
+            self._time[self._size : size] = times
+        elif self._time is not None:
+            self._time[self._size : size] = np.nan
+        self._size = size
+
+    def _reserve(self, capacity: int) -> None:
+        """Reallocate the arrays so that they can store the given edges.
+
+        Args:
+          capacity: new capacity, which must be larger than the size.
+        """
+        capacity = max(capacity, _INITIAL_CAPACITY)
+        self._reviewer = _resize(self._reviewer, capacity, self._size)
+        self._product = _resize(self._product, capacity, self._size)
+        self._rating = _resize(self._rating, capacity, self._size)
+        if self._time is not None:
+            self._time = _resize(self._time, capacity, self._size)
+
+    def csr(
+        self,
+        shape: tuple[int, int],
+        weights: NDArray[np.float64] | None = None,
+    ) -> sparse.csr_matrix:
+        """Build the adjacency matrix in CSR format.
+
+        Rows are reviewers and columns are products. Without weights, the
+        matrix is 0/1 and edges appended more than once are stored only
+        once. With weights, entries are the weights of the edges, and only
+        the latest of duplicated edges is used.
+
+        Args:
+          shape: shape of the matrix, i.e. the numbers of reviewers and
+            products.
+          weights: weights of the stored edges. (default: None)
+
+        Returns:
+          the adjacency matrix.
+        """
+        M: sparse.csr_matrix = self._build(sparse.csr_matrix, shape, weights)
+        return M
+
+    def csc(
+        self,
+        shape: tuple[int, int],
+        weights: NDArray[np.float64] | None = None,
+    ) -> sparse.csc_matrix:
+        """Build the adjacency matrix in CSC format.
+
+        Args:
+          shape: shape of the matrix, i.e. the numbers of reviewers and
+            products.
+          weights: weights of the stored edges. (default: None)
+
+        Returns:
+          the adjacency matrix.
+        """
+        M: sparse.csc_matrix = self._build(sparse.csc_matrix, shape, weights)
+        return M
+
+    def latest(self, num_products: int) -> NDArray[np.int64]:
+        """Find the latest edge of each reviewer and product pair.
+
+        Args:
+          num_products: the number of products, or any larger number.
+
+        Returns:
+          indices of the latest edges, sorted by reviewer and product IDs.
+        """
+        keys = self.reviewer_ids * num_products + self.product_ids
+        _, first = np.unique(keys[::-1], return_index=True)
+        res: NDArray[np.int64] = self._size - 1 - first
+        return res
+
+    def _build(
+        self,
+        fmt: type[sparse.spmatrix],
+        shape: tuple[int, int],
+        weights: NDArray[np.float64] | None,
+    ) -> sparse.spmatrix:
+        """Build the adjacency matrix without duplicated edges.
+
+        Args:
+          fmt: class of the matrix.
+          shape: shape of the matrix.
+          weights: weights of the stored edges, or None for a 0/1 matrix.
+
+        Returns:
+          the adjacency matrix.
+        """
+        rows = self.reviewer_ids
+        cols = self.product_ids
+        if weights is None:
+            # duplicates are summed by the conversion, then reset to 1.
+            M = fmt(
+                (np.ones(self._size, dtype=int), (rows, cols)), shape=shape
+            )
+            M.data[:] = 1
+            return M
+
+        idx = self.latest(shape[1])
+        return fmt(
+            (
+                np.asarray(weights, dtype=np.float64)[idx],
+                (rows[idx], cols[idx]),
+            ),
+            shape=shape,
+        )
+
+
+def _resize(a: NDArray[_T], capacity: int, size: int) -> NDArray[_T]:
+    """Copy the first elements of an array to a new array.
+
+    Args:
+      a: source array.
+      capacity: length of the new array.
+      size: number of elements to be copied.
+
+    Returns:
+      the new array.
+    """
+    res = np.empty(capacity, dtype=a.dtype)
+    res[:size] = a[:size]
+    return res
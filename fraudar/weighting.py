@@ -0,0 +1,129 @@
+#
+#  weighting.py
+#
+#  Copyright (c) 2016-2025 Junpei Kawamoto
+#
+#  This file is part of rgmining-fraudar.
+#
+#  rgmining-fraudar is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  rgmining-fraudar is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with rgmining-fraudar. If not, see <http://www.gnu.org/licenses/>.
+#
+"""Provide per-edge weightings of a review graph.
+
+A weighting takes the :class:`EdgeStore <fraudar.storage.EdgeStore>` of a
+graph and returns a weight for each stored edge. Pass one to
+:class:`ReviewGraph <fraudar.graph.ReviewGraph>` to detect blocks on the
+weighted adjacency matrix; the column weights of the detection algorithm
+are then multiplied with the edge weights. Use :func:`functools.partial`
+to set parameters, e.g. ``partial(time_burst, window=3600)``.
+"""
+
+from collections.abc import Callable
+from typing import TypeAlias
+
+import numpy as np
+from numpy.typing import NDArray
+
+from fraudar.storage import EdgeStore
+
+Weighting: TypeAlias = Callable[[EdgeStore], NDArray[np.float64]]
+"""A function computing weights of the edges in a store."""
+
+
+def rating_deviation(edges: EdgeStore) -> NDArray[np.float64]:
+    """Weight edges by how far their ratings are from the product mean.
+
+    The weight of an edge is one plus the absolute difference between its
+    rating and the mean rating of its product, so that every edge still
+    counts.
+
+    Args:
+      edges: edges of a graph.
+
+    Returns:
+      weights of the edges.
+    """
+    products = edges.product_ids
+    ratings = edges.ratings
+    sums = np.bincount(products, weights=ratings)
+    counts = np.bincount(products)
+    means = sums / np.maximum(counts, 1)
+    res: NDArray[np.float64] = 1 + np.abs(ratings - means[products])
+    return res
+
+
+def time_burst(
+    edges: EdgeStore, window: float = 86400.0
+) -> NDArray[np.float64]:
+    """Weight edges by the number of reviews their product got around them.
+
+    The weight of an edge is the number of reviews of the same product,
+    including itself, posted within ``window`` before or after it. Edges
+    without a time are weighted one.
+
+    Args:
+      edges: edges of a graph.
+      window: half width of the time window. (default: one day in seconds)
+
+    Returns:
+      weights of the edges.
+    """
+    res = np.ones(len(edges))
+    times = edges.times
+    if times is None:
+        return res
+
+    idx = np.flatnonzero(~np.isnan(times))
+    order = np.lexsort((times[idx], edges.product_ids[idx]))
+    idx = idx[order]
+    products = edges.product_ids[idx]
+    t = times[idx]
+
+    # reviews of a product occupy [lo, hi) in the sorted arrays.
+    lo = np.searchsorted(products, products, side="left")
+    hi = np.searchsorted(products, products, side="right")
+    res[idx] = _bisect(t, lo, hi, t + window, True) - _bisect(
+        t, lo, hi, t - window, False
+    )
+    return res
+
+
+def _bisect(
+    a: NDArray[np.float64],
+    lo: NDArray[np.int64],
+    hi: NDArray[np.int64],
+    x: NDArray[np.float64],
+    right: bool,
+) -> NDArray[np.int64]:
+    """Run binary searches on many sorted ranges of an array at once.
+
+    Args:
+      a: array sorted within each range.
+      lo: start of the range of each search.
+      hi: end of the range of each search.
+      x: values to be searched.
+      right: if True, return the index after the equal values as
+        :func:`numpy.searchsorted` with ``side="right"``.
+
+    Returns:
+      insertion points of the values.
+    """
+    lo = lo.copy()
+    hi = hi.copy()
+    while (active := lo < hi).any():
+        mid = (lo + hi) // 2
+        v = a[np.where(active, mid, 0)]
+        go_right = active & ((v <= x) if right else (v < x))
+        lo = np.where(go_right, mid + 1, lo)
+        hi = np.where(active & ~go_right, mid, hi)
+    return lo
@@ -0,0 +1,77 @@
+#
+#  test_benchmark.py
+#
+#  Copyright (c) 2016-2025 Junpei Kawamoto
+#
+#  This file is part of rgmining-fraudar.
+#
+#  rgmining-fraudar is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  rgmining-fraudar is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with rgmining-fraudar. If not, see <http://www.gnu.org/licenses/>.
+#
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from fraudar import benchmark
+
+
+@pytest.mark.parametrize("camouflage", ["none", "random", "biased"])
+def test_generate(camouflage: benchmark.Camouflage) -> None:
+    """Test a generated graph contains its block and is reproducible."""
+    g = benchmark.generate(5000, seed=1, camouflage=camouflage)
+    m, n = g.shape
+    assert g.reviewers.max() < m
+    assert g.products.max() < n
+    rows, cols = g.block
+    assert len(rows) == len(cols) == 10
+
+    in_block = np.isin(g.reviewers, list(rows)) & np.isin(
+        g.products, list(cols)
+    )
+    assert in_block.sum() >= 0.3 * 100
+
+    again = benchmark.generate(5000, seed=1, camouflage=camouflage)
+    assert (again.reviewers == g.reviewers).all()
+    assert (again.products == g.products).all()
+
+
+def test_main(tmp_path: Path) -> None:
+    """Test the command writes measurements of every case as JSON."""
+    output = tmp_path / "result.json"
+    benchmark.main(
+        [
+            "--edges",
+            "1e3",
+            "2000",
+            "--engine",
+            "compiled",
+            "python",
+            "--no-isolate",
+            "--output",
+            str(output),
+        ]
+    )
+    res = json.loads(output.read_text())
+    assert [(c["nnz"] > 0, c["engine"]) for c in res["cases"]] == [
+        (True, "compiled"),
+        (True, "python"),
+    ] * 2
+    case = res["cases"][0]
+    assert set(case["detect_multiple"]) == set(benchmark.ALGORITHMS)
+    ave = case["detect_multiple"]["aveDegree"]
+    assert 0 <= ave["f_measure"] <= 1
+    assert ave["phases"]["peel"]["items_per_second"] > 0
+    assert case["update"]["seconds"] > 0
+    assert case["peak_rss"] > 0
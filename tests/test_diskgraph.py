@@ -0,0 +1,116 @@
+#
+#  test_diskgraph.py
+#
+#  Copyright (c) 2016-2025 Junpei Kawamoto
+#
+#  This file is part of rgmining-fraudar.
+#
+#  rgmining-fraudar is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  rgmining-fraudar is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with rgmining-fraudar. If not, see <http://www.gnu.org/licenses/>.
+#
+from functools import partial
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pytest
+from scipy import sparse
+
+from fraudar.diskgraph import DiskGraph
+from fraudar.export import greedy
+
+
+@pytest.fixture
+def matrix() -> Any:
+    """Returns a random sparse matrix with a dense 10x8 block."""
+    rng = np.random.default_rng(1)
+    rows = np.concatenate(
+        [rng.integers(0, 100, 600), np.repeat(np.arange(10), 8)]
+    )
+    cols = np.concatenate(
+        [rng.integers(0, 80, 600), np.tile(np.arange(8), 10)]
+    )
+    return greedy.listToSparseMatrix(rows, cols, shape=(100, 80))
+
+
+def test_write(tmp_path: Path, matrix: Any) -> None:
+    """Test a written graph has the same matrix and names."""
+    reviewers = [f"r{i}" for i in range(100)]
+    products = [f"製品{j}" for j in range(80)]
+    g = DiskGraph.write(tmp_path, matrix, reviewers, products)
+
+    assert g.shape == (100, 80)
+    assert (g.csr != matrix).nnz == 0
+    assert (g.csc != matrix).nnz == 0
+    # arrays are read-only views of the files, not copies.
+    assert not g.csr.data.flags.writeable
+    assert not g.csc.indices.flags.writeable
+    assert g.reviewer_name(3) == "r3"
+    assert g.product_name(79) == "製品79"
+
+    g = DiskGraph.write(tmp_path / "default", matrix)
+    assert g.reviewer_name(5) == "5"
+
+
+def test_write_arrays(tmp_path: Path) -> None:
+    """Test writing names in arrays does not change a CSR matrix."""
+    # entry (0, 1) is stored twice.
+    M = sparse.csr_matrix(
+        (np.array([1.0, 2.0, 3.0]), np.array([1, 1, 0]), np.array([0, 2, 3])),
+        shape=(2, 2),
+    )
+    data = M.data.copy()
+
+    g = DiskGraph.write(
+        tmp_path, M, np.array(["a", "b"]), np.array(["x", "y"])
+    )
+    assert g.csr.toarray().tolist() == [[0, 3], [3, 0]]
+    assert g.reviewer_name(1) == "b"
+    assert g.product_name(0) == "x"
+    assert M.nnz == 3
+    assert (M.data == data).all()
+
+
+@pytest.mark.parametrize(
+    "algo",
+    [
+        greedy.aveDegree,
+        greedy.logWeightedAveDegree,
+        greedy.sqrtWeightedAveDegree,
+    ],
+)
+@pytest.mark.parametrize("engine", ["compiled", "python"])
+def test_detect_multiple(
+    tmp_path: Path, matrix: Any, algo: Any, engine: str
+) -> None:
+    """Test detection on a disk graph equals detection in memory."""
+    g = DiskGraph.write(tmp_path, matrix)
+    algo = partial(algo, engine=engine)
+
+    res = greedy.detectMultiple(g, algo, 2)
+    expect = greedy.detectMultiple(matrix, algo, 2)
+    assert [b for b, _ in res] == [b for b, _ in expect]
+    np.testing.assert_almost_equal([s for _, s in res], [s for _, s in expect])
+
+    # removing blocks must not modify the files.
+    assert (DiskGraph(tmp_path).csr != matrix).nnz == 0
+
+
+def test_version(tmp_path: Path, matrix: Any) -> None:
+    """Test an unsupported format version is rejected."""
+    DiskGraph.write(tmp_path, matrix)
+    (tmp_path / "meta.json").write_text(
+        '{"version": 0, "shape": [100, 80], "edges": 0}'
+    )
+    with pytest.raises(ValueError):
+        DiskGraph(tmp_path)
@@ -0,0 +1,386 @@
+#
+#  test_greedy.py
+#
+#  Copyright (c) 2016-2025 Junpei Kawamoto
+#
+#  This file is part of rgmining-fraudar.
+#
+#  rgmining-fraudar is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  rgmining-fraudar is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with rgmining-fraudar. If not, see <http://www.gnu.org/licenses/>.
+#
+from functools import partial
+from typing import Any
+
+import numpy as np
+import pytest
+from numpy.testing import assert_almost_equal, assert_array_equal
+from scipy import sparse
+
+from fraudar.export import greedy
+from fraudar.export.MinTree import BucketQueue, LazyHeap, MinTree
+
+
+@pytest.fixture
+def matrix() -> Any:
+    """Returns a random sparse matrix with a dense 15x12 block."""
+    rng = np.random.default_rng(0)
+    rows = np.concatenate(
+        [rng.integers(0, 200, 1500), np.repeat(np.arange(15), 12)]
+    )
+    cols = np.concatenate(
+        [rng.integers(0, 150, 1500), np.tile(np.arange(12), 15)]
+    )
+    return greedy.listToSparseMatrix(rows, cols, shape=(200, 150))
+
+
+@pytest.mark.parametrize(
+    "algo",
+    [
+        greedy.aveDegree,
+        greedy.logWeightedAveDegree,
+        greedy.sqrtWeightedAveDegree,
+    ],
+)
+def test_compiled_engine(matrix: Any, algo: Any) -> None:
+    """Test the compiled engine returns the same block as the python one."""
+    (rows, cols), score = algo(matrix, engine="compiled")
+    (expect_rows, expect_cols), expect_score = algo(matrix, engine="python")
+
+    assert rows == expect_rows
+    assert cols == expect_cols
+    assert_almost_equal(score, expect_score)
+    assert set(range(15)) <= rows
+
+
+@pytest.mark.parametrize(
+    "algo", [greedy.aveDegree, greedy.logWeightedAveDegree]
+)
+@pytest.mark.parametrize("priority", [BucketQueue, LazyHeap])
+def test_priority(matrix: Any, algo: Any, priority: Any) -> None:
+    """Test priority structures give the same block as MinTree."""
+    if algo is greedy.logWeightedAveDegree and priority is BucketQueue:
+        pytest.skip("BucketQueue requires integer degrees")
+    assert algo(matrix, priority=priority) == algo(matrix, priority=MinTree)
+
+
+def test_choose_priority() -> None:
+    """Test choosePriority picks BucketQueue only for integer degrees."""
+    ones = np.ones(3)
+    degrees = np.array([1.0, 2.0, 3.0])
+    assert greedy.choosePriority(ones, degrees, degrees) is BucketQueue
+    assert greedy.choosePriority(ones / 2, degrees, degrees) is LazyHeap
+    assert greedy.choosePriority(ones, degrees + 0.5, degrees) is LazyHeap
+    assert greedy.choosePriority(ones, degrees - 2, degrees) is LazyHeap
+    assert greedy.choosePriority(ones, degrees, degrees + 1e9) is LazyHeap
+
+
+def test_integer_priors() -> None:
+    """Test negative and large integer priors give the same block as MinTree."""
+    rng = np.random.default_rng(3)
+    for prior in (-1, -2, 10**9):
+        for _ in range(20):
+            M = sparse.csr_matrix(rng.integers(0, 2, (15, 10)).astype(float))
+            susp = (
+                rng.integers(0, 2, 15) * prior * 1.0,
+                rng.integers(0, 2, 10) * prior * 1.0,
+            )
+            assert greedy.aveDegree(
+                M, susp, engine="python"
+            ) == greedy.aveDegree(M, susp, engine="python", priority=MinTree)
+
+
+def test_unknown_engine(matrix: Any) -> None:
+    """Test fastGreedyDecreasing rejects an unknown engine."""
+    with pytest.raises(ValueError):
+        greedy.aveDegree(matrix, engine="unknown")
+    with pytest.raises(ValueError):
+        greedy.aveDegree(matrix, engine="compiled", priority=MinTree)
+    with pytest.raises(ValueError):
+        greedy.aveDegree(matrix, engine="batch", priority=MinTree)
+    with pytest.raises(ValueError):
+        greedy.aveDegree(matrix, engine="python", epsilon=0.1)
+    with pytest.raises(ValueError):
+        greedy.aveDegree(matrix, epsilon=0)
+
+
+@pytest.mark.parametrize(
+    "algo",
+    [
+        greedy.aveDegree,
+        greedy.logWeightedAveDegree,
+        greedy.sqrtWeightedAveDegree,
+    ],
+)
+@pytest.mark.parametrize("epsilon", [0.01, 0.1, 1.0])
+def test_batch_engine(matrix: Any, algo: Any, epsilon: float) -> None:
+    """Test the batch engine finds the block within its approximation."""
+    (rows, cols), score = algo(matrix, epsilon=epsilon)
+    _, expect_score = algo(matrix, engine="python")
+
+    # greedy peeling is within a factor 2 of the densest block.
+    assert score <= 2 * expect_score
+    assert score >= expect_score / (2 * (1 + epsilon))
+    assert set(range(15)) <= rows
+    assert set(range(12)) <= cols
+    if algo is greedy.aveDegree:
+        total = greedy.c2Score(
+            matrix, rows, cols, (np.zeros(200), np.zeros(150))
+        )
+        assert_almost_equal(score, total / (len(rows) + len(cols)))
+    assert algo(matrix, engine="batch") == algo(matrix, epsilon=0.1)
+
+
+@pytest.mark.parametrize("engine", ["compiled", "python", "batch"])
+def test_peel_scores(matrix: Any, engine: str) -> None:
+    """Test the trace of peeling ranks the detected block first."""
+    trace: list[greedy.Trace] = []
+    (rows, cols), score = greedy.logWeightedAveDegree(
+        matrix, engine=engine, trace=trace
+    )
+    assert len(trace) == 1
+    order, ave_scores, deltas = trace[0]
+    assert len(ave_scores) == len(order) + 1
+    assert len(deltas) == len(order)
+    # every removal decreases the score by its delta.
+    assert_almost_equal(
+        ave_scores[0] * 350 - deltas.sum(),
+        ave_scores[-1] * (350 - len(order)),
+    )
+    assert len(set(order.tolist())) == len(order)
+
+    row_scores, col_scores = greedy.peelScores(order, ave_scores, (200, 150))
+    assert set(np.flatnonzero(row_scores == score).tolist()) == rows
+    assert set(np.flatnonzero(col_scores == score).tolist()) == cols
+    assert row_scores.max() == col_scores.max() == score
+
+
+def test_peel_trace(matrix: Any) -> None:
+    """Test the compiled and python engines peel in the same order."""
+    compiled: list[greedy.Trace] = []
+    python: list[greedy.Trace] = []
+    greedy.aveDegree(matrix, engine="compiled", trace=compiled)
+    greedy.aveDegree(matrix, engine="python", trace=python)
+    assert_array_equal(compiled[0][0], python[0][0])
+    assert_almost_equal(compiled[0][1], python[0][1])
+
+
+def test_remove_block(matrix: Any) -> None:
+    """Test removeBlock drops only the edges inside the block."""
+    M = matrix.tocsr()
+    expect = M.toarray()
+    expect[np.ix_([0, 3, 5], [1, 2])] = 0
+
+    greedy.removeBlock(M, {0, 3, 5}, {1, 2})
+    assert (M.toarray() == expect).all()
+    assert (M.data != 0).all()
+
+
+def test_detect_multiple(matrix: Any) -> None:
+    """Test detectMultiple detects the next block on the residual matrix."""
+    res = greedy.detectMultiple(matrix, greedy.aveDegree, 2)
+    assert len(res) == 2
+    assert res[0] == greedy.aveDegree(matrix)
+
+    (rows, cols), _ = res[0]
+    residual = matrix.toarray()
+    residual[np.ix_(sorted(rows), sorted(cols))] = 0
+    assert res[1] == greedy.aveDegree(sparse.csr_matrix(residual))
+
+
+def test_detect_multiple_custom(matrix: Any) -> None:
+    """Test detectMultiple gives a custom detectFunc a scipy sparse matrix."""
+    given: list[Any] = []
+
+    def detect(M: Any) -> Any:
+        assert sparse.issparse(M)
+        given.append((M.sum(), M.nnz, M.tocsc().toarray()))
+        return greedy.aveDegree(M)
+
+    res = greedy.detectMultiple(matrix, detect, 2)
+    assert res == greedy.detectMultiple(matrix, greedy.aveDegree, 2)
+
+    (rows, cols), _ = res[0]
+    residual = matrix.toarray()
+    residual[np.ix_(sorted(rows), sorted(cols))] = 0
+    assert given[0][:2] == (matrix.sum(), matrix.nnz)
+    assert given[1][:2] == (residual.sum(), np.count_nonzero(residual))
+    assert_array_equal(given[1][2], residual)
+
+
+def test_accepts_matrix_pair() -> None:
+    """Test detectFuncs marked by acceptsMatrixPair are recognized."""
+    assert greedy.takesMatrixPair(greedy.aveDegree)
+    assert greedy.takesMatrixPair(
+        partial(partial(greedy.logWeightedAveDegree, engine="python"))
+    )
+    assert not greedy.takesMatrixPair(lambda M: greedy.aveDegree(M))
+
+
+@pytest.mark.parametrize("engine", ["compiled", "python"])
+def test_matrix_pair(matrix: Any, engine: str) -> None:
+    """Test a matrix pair gives the same blocks and its residual is a copy."""
+    pair = greedy.MatrixPair(matrix)
+    assert pair.csr.has_canonical_format
+    assert pair.csc.has_canonical_format
+    assert_array_equal(pair.csc.toarray(), matrix.toarray())
+
+    algo = partial(greedy.logWeightedAveDegree, engine=engine)
+    assert greedy.detectMultiple(pair, algo, 2) == greedy.detectMultiple(
+        matrix, algo, 2
+    )
+    assert_array_equal(pair.csr.toarray(), matrix.toarray())
+    assert_array_equal(pair.csc.toarray(), matrix.toarray())
+
+
+def test_matrix_pair_cache() -> None:
+    """Test cached values are refreshed after a block is removed."""
+    rng = np.random.default_rng(0)
+    M = greedy.listToSparseMatrix(
+        rng.integers(0, 2000, 20000),
+        rng.integers(0, 1500, 20000),
+        shape=(2000, 1500),
+    )
+    pair = greedy.MatrixPair(M)
+    scale = 1 / np.log(greedy.columnDegrees(pair) + 5)
+    greedy.lineSums(pair, scale)
+    greedy.weightedPair(pair, scale)
+
+    greedy.removeBlock(pair, set(range(100)), {0, 1, 2})
+    scale = 1 / np.log(greedy.columnDegrees(pair) + 5)
+    changed = greedy.changedColumns(pair, "lineSums", scale)
+    assert changed is not None
+    assert_array_equal(changed, [0, 1, 2])
+
+    residual = M.toarray().astype(float)
+    residual[:100, :3] = 0
+    expect = sparse.csr_matrix(residual)
+    assert_array_equal(
+        greedy.columnDegrees(pair), greedy.columnDegrees(expect)
+    )
+    row_sums, col_sums = greedy.lineSums(pair, scale)
+    assert_array_equal(row_sums, expect @ scale)
+    assert_array_equal(col_sums, residual.sum(axis=0))
+    W = greedy.weightedPair(pair, scale)
+    assert_almost_equal(W.csr.toarray(), residual * scale)
+    assert_almost_equal(W.csc.toarray(), residual * scale)
+
+
+@pytest.mark.parametrize(
+    "algo", [greedy.aveDegree, greedy.logWeightedAveDegree]
+)
+def test_weighted_matrix(matrix: Any, algo: Any) -> None:
+    """Test both engines agree on a matrix with weighted edges."""
+    M = matrix.tocsr().astype(float)
+    M.data *= np.random.default_rng(1).uniform(0.5, 2, M.nnz)
+    (rows, cols), score = algo(M, engine="compiled")
+    (expect_rows, expect_cols), expect_score = algo(M, engine="python")
+
+    assert rows == expect_rows
+    assert cols == expect_cols
+    assert_almost_equal(score, expect_score)
+
+    # column weights are computed from degrees and applied to edge weights.
+    W = M
+    if algo is greedy.logWeightedAveDegree:
+        W = M.multiply(1 / np.log(greedy.columnDegrees(M) + 5)).tocsr()
+    susp = (np.zeros(M.shape[0]), np.zeros(M.shape[1]))
+    assert_almost_equal(
+        score, greedy.c2Score(W, rows, cols, susp) / (len(rows) + len(cols))
+    )
+
+
+def test_c2_score(matrix: Any) -> None:
+    """Test c2Score equals the sum of the submatrix plus the priors."""
+    rng = np.random.default_rng(2)
+    susp = (rng.uniform(size=200), rng.uniform(size=150))
+    rows = {0, 3, 7, 150}
+    cols = {1, 2, 99}
+    expect = (
+        matrix.toarray()[np.ix_(sorted(rows), sorted(cols))].sum()
+        + susp[0][sorted(rows)].sum()
+        + susp[1][sorted(cols)].sum()
+    )
+    assert_almost_equal(greedy.c2Score(matrix, rows, cols, susp), expect)
+
+
+@pytest.mark.parametrize("engine", ["compiled", "python"])
+def test_node_susp(matrix: Any, engine: str) -> None:
+    """Test priors pull suspicious nodes into the detected block."""
+    susp = (np.zeros(200), np.zeros(150))
+    susp[0][100:110] = 20
+    (rows, _), score = greedy.detectMultiple(
+        matrix, partial(greedy.aveDegree, engine=engine), 1, susp
+    )[0]
+    assert set(range(100, 110)) <= rows
+    assert score > greedy.aveDegree(matrix, engine=engine)[1]
+
+
+@pytest.mark.parametrize("test_idx", [1, 2, 3])
+def test_inject_clique_camo(matrix: Any, test_idx: int) -> None:
+    """Test injected blocks have the density and camouflage of a mode."""
+    M = greedy.injectCliqueCamo(
+        matrix, 30, 20, 0.5, test_idx, seed=3, numBlocks=2
+    )
+    assert M.format == "csc"
+    again = greedy.injectCliqueCamo(
+        matrix, 30, 20, 0.5, test_idx, seed=3, numBlocks=2
+    )
+    assert (M != again).nnz == 0
+
+    before = matrix.toarray()
+    after = M.toarray()
+    assert ((after == 1) | (after == before)).all()
+    assert set(np.unique(after)) <= {0, 1}
+    for k in range(2):
+        rows = slice(30 * k, 30 * (k + 1))
+        cols = slice(20 * k, 20 * (k + 1))
+        empty = before[rows, cols] == 0
+        assert 0.35 < after[rows, cols][empty].mean() < 0.65
+    assert (after[60:] == before[60:]).all()
+
+    camo = (after[:60, 40:] - before[:60, 40:]).sum(axis=1)
+    expect = {1: 10, 2: 20, 3: 10}[test_idx]
+    assert abs(camo.mean() - expect) < 0.3 * expect
+    if test_idx == 3:
+        # camouflage goes to columns in proportion to their degrees.
+        assert (after[:60, 40:] > before[:60, 40:])[
+            :, before[:, 40:].sum(axis=0) == 0
+        ].sum() == 0
+
+
+def test_inject_clique_camo_too_large(matrix: Any) -> None:
+    """Test blocks which don't fit in the matrix are rejected."""
+    with pytest.raises(ValueError):
+        greedy.injectCliqueCamo(matrix, 150, 10, 0.5, 1, numBlocks=2)
+
+
+def test_core_subset_above_degree(matrix: Any) -> None:
+    """Test repeated filtering leaves only rows and columns above thresholds."""
+    M, row_filter, col_filter = greedy.coreSubsetAboveDegree(matrix, 9, 7)
+
+    # applying subsetAboveDegree until it converges gives the same core.
+    expect = matrix.tocsr()
+    rows = np.arange(200)
+    cols = np.arange(150)
+    while True:
+        sub, r, c = greedy.subsetAboveDegree(expect, 9, 7)
+        if sub.shape == expect.shape:
+            break
+        expect, rows, cols = sub, rows[r], cols[c]
+
+    assert (M != expect).nnz == 0
+    assert_array_equal(row_filter, rows)
+    assert_array_equal(col_filter, cols)
+    assert (np.diff(M.tocsr().indptr) > 7).all()
+    assert (np.diff(M.tocsc().indptr) > 9).all()
+    assert set(range(15)) <= set(row_filter.tolist())
@@ -0,0 +1,104 @@
+#
+#  test_instrument.py
+#
+#  Copyright (c) 2016-2025 Junpei Kawamoto
+#
+#  This file is part of rgmining-fraudar.
+#
+#  rgmining-fraudar is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  rgmining-fraudar is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with rgmining-fraudar. If not, see <http://www.gnu.org/licenses/>.
+#
+import logging
+import tracemalloc
+from functools import partial
+from itertools import groupby
+
+import numpy as np
+import pytest
+
+from fraudar import ReviewGraph, instrument
+from fraudar.export import greedy
+from fraudar.instrument import PhaseRecord
+
+
+@pytest.mark.parametrize("engine", ["compiled", "python"])
+def test_update(
+    engine: str,
+    capsys: pytest.CaptureFixture[str],
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    """Test update reports every phase without printing to stdout."""
+    rng = np.random.default_rng(0)
+    graph = ReviewGraph.from_edges(
+        rng.integers(0, 50, 300),
+        rng.integers(0, 40, 300),
+        np.ones(300),
+        blocks=2,
+        algo=partial(greedy.logWeightedAveDegree, engine=engine),
+    )
+    with caplog.at_level(logging.DEBUG, "fraudar"):
+        with instrument.collect() as records:
+            graph.update()
+
+    # the python engine also weights the matrix itself.
+    names = [k for k, _ in groupby(r.name for r in records)]
+    assert names == ["build_matrix"] + [
+        "weighting",
+        "build_trees",
+        "peel",
+        "remove_block",
+    ] + ["weighting", "build_trees", "peel"]
+    peel = next(r for r in records if r.name == "peel")
+    assert peel.items is not None and peel.items > 0
+    assert peel.rate is not None and peel.rate > 0
+    assert capsys.readouterr().out == ""
+    assert "peel" in caplog.text
+
+
+def test_peak_memory() -> None:
+    """Test nested phases measure peak memory while tracing."""
+    with instrument.collect() as records:
+        with instrument.phase("outer"):
+            with instrument.phase("inner"):
+                pass
+    assert [r.peak_memory for r in records] == [None, None]
+
+    tracemalloc.start()
+    try:
+        with instrument.collect() as records:
+            with instrument.phase("outer"):
+                with instrument.phase("inner"):
+                    a = np.ones(1 << 20)
+                    del a
+    finally:
+        tracemalloc.stop()
+
+    inner, outer = records
+    assert inner.name == "inner"
+    assert inner.peak_memory is not None and inner.peak_memory >= 8 << 20
+    assert outer.peak_memory is not None
+    assert outer.peak_memory >= inner.peak_memory
+
+
+def test_sinks() -> None:
+    """Test sinks are called until removed and failed phases are skipped."""
+    records: list[PhaseRecord] = []
+    instrument.add_sink(records.append)
+    with instrument.phase("a"):
+        pass
+    with pytest.raises(RuntimeError), instrument.phase("b"):
+        raise RuntimeError
+    instrument.remove_sink(records.append)
+    with instrument.phase("c"):
+        pass
+    assert [r.name for r in records] == ["a"]
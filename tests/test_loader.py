@@ -0,0 +1,134 @@
+#
+#  test_loader.py
+#
+#  Copyright (c) 2016-2025 Junpei Kawamoto
+#
+#  This file is part of rgmining-fraudar.
+#
+#  rgmining-fraudar is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  rgmining-fraudar is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with rgmining-fraudar. If not, see <http://www.gnu.org/licenses/>.
+#
+import gzip
+from pathlib import Path
+
+import numpy as np
+import pytest
+from numpy.testing import assert_array_equal
+
+from fraudar.export import greedy
+from fraudar.loader import IdMap, iter_edges, load_edges
+
+SOURCES = np.array([0, 3, 1, 3, 2])
+DESTS = np.array([1, 0, 4, 2, 1])
+
+
+def test_whitespace(tmp_path: Path) -> None:
+    """Test reading the format of readData in small chunks."""
+    path = tmp_path / "edges.txt"
+    path.write_text(
+        "".join(f"{s} {d}\n" for s, d in zip(SOURCES, DESTS, strict=True))
+    )
+    chunks = list(iter_edges(path, chunk_size=2))
+    assert [len(src) for src, _ in chunks] == [2, 2, 1]
+
+    src, dst = load_edges(path, chunk_size=2)
+    assert_array_equal(src, SOURCES)
+    assert_array_equal(dst, DESTS)
+
+    M = greedy.readData(path)
+    assert M.shape == (4, 5)
+    assert (M != greedy.listToSparseMatrix(SOURCES, DESTS)).nnz == 0
+
+
+def test_csv_gzip(tmp_path: Path) -> None:
+    """Test reading a compressed CSV file with a header by column names."""
+    path = tmp_path / "edges.csv.gz"
+    with gzip.open(path, "wt") as fp:
+        fp.write("rating,product,reviewer\n")
+        for s, d in zip(SOURCES, DESTS, strict=True):
+            fp.write(f"5,{d},{s}\n")
+
+    src, dst = load_edges(path, ("reviewer", "product"), header=True)
+    assert_array_equal(src, SOURCES)
+    assert_array_equal(dst, DESTS)
+
+    with pytest.raises(ValueError):
+        load_edges(path, ("user", "product"), header=True)
+
+
+def test_string_ids(tmp_path: Path) -> None:
+    """Test string IDs are mapped to dense integers across files."""
+    path = tmp_path / "edges.tsv"
+    path.write_text("alice\tx\nbob\ty\nalice\ty\n")
+    reviewers = IdMap()
+    products = IdMap()
+
+    src, dst = load_edges(path, reviewers=reviewers, products=products)
+    assert_array_equal(src, [0, 1, 0])
+    assert_array_equal(dst, [0, 1, 1])
+
+    path.write_text("carol\ty\nbob\tz\n")
+    src, dst = load_edges(path, reviewers=reviewers, products=products)
+    assert_array_equal(src, [2, 1])
+    assert_array_equal(dst, [1, 2])
+    assert reviewers.names == ["alice", "bob", "carol"]
+    assert len(products) == 3
+
+
+def test_id_map() -> None:
+    """Test IdMap assigns IDs in the order names first appear."""
+    ids = IdMap()
+    assert_array_equal(
+        ids.map(np.array(["c", "a", "c", "b", "a"])), [0, 1, 0, 2, 1]
+    )
+    assert_array_equal(ids.map(np.array(["b", "d", "a", "d"])), [2, 3, 1, 3])
+    assert ids.names == ["c", "a", "b", "d"]
+
+    # Names which cannot be sorted.
+    ids = IdMap()
+    assert_array_equal(
+        ids.map(np.array([1, "x", None, "x"], dtype=object)), [0, 1, 2, 1]
+    )
+
+
+def test_npz(tmp_path: Path) -> None:
+    """Test reading .npz archives of a 2-D array and of 1-D arrays."""
+    path = tmp_path / "edges.npz"
+    np.savez(path, np.stack([SOURCES, DESTS], axis=1))
+    src, dst = load_edges(path, chunk_size=3)
+    assert_array_equal(src, SOURCES)
+    assert_array_equal(dst, DESTS)
+
+    np.savez(path, src=SOURCES, dst=DESTS)
+    src, dst = load_edges(path, ("src", "dst"))
+    assert_array_equal(src, SOURCES)
+    assert_array_equal(dst, DESTS)
+
+
+def test_parquet(tmp_path: Path) -> None:
+    """Test reading a Parquet file."""
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "edges.parquet"
+    pq.write_table(pa.table({"reviewer": SOURCES, "product": DESTS}), path)
+    src, dst = load_edges(path, ("reviewer", "product"), chunk_size=2)
+    assert_array_equal(src, SOURCES)
+    assert_array_equal(dst, DESTS)
+
+
+def test_empty(tmp_path: Path) -> None:
+    """Test an empty file gives empty arrays."""
+    path = tmp_path / "edges.txt"
+    path.touch()
+    src, dst = load_edges(path)
+    assert len(src) == len(dst) == 0
@@ -0,0 +1,79 @@
+#
+#  test_min_tree.py
+#
+#  Copyright (c) 2016-2025 Junpei Kawamoto
+#
+#  This file is part of rgmining-fraudar.
+#
+#  rgmining-fraudar is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  rgmining-fraudar is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with rgmining-fraudar. If not, see <http://www.gnu.org/licenses/>.
+#
+from typing import Any
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+
+from fraudar.export.MinTree import (
+    ArrayMinTree,
+    BucketQueue,
+    LazyHeap,
+    MinTree,
+)
+
+
+def test_array_min_tree() -> None:
+    """Test ArrayMinTree behaves like MinTree."""
+    rng = np.random.default_rng(0)
+    degrees = rng.random(37)
+    expect = MinTree(degrees.tolist())
+    tree = ArrayMinTree(degrees)
+    assert tree.getMin() == expect.getMin()
+
+    for _ in range(100):
+        idx = rng.choice(37, rng.integers(1, 10), replace=False)
+        deltas = rng.random(len(idx)) - 0.5
+        tree.changeVals(idx, deltas)
+        expect.changeVals(idx.tolist(), deltas.tolist())
+        assert tree.getMin() == expect.getMin()
+        assert_allclose(tree.nodes, expect.nodes)
+
+        i = int(rng.integers(37))
+        tree.changeVal(i, 0.25)
+        expect.changeVal(i, 0.25)
+        assert tree.getMin() == expect.getMin()
+        assert_allclose(tree.nodes, expect.nodes)
+
+
+@pytest.mark.parametrize(
+    ("priority", "degrees"),
+    [
+        (BucketQueue, [3, 1, 4, 1, 5, 9, 2, 6, 5, 3]),
+        (LazyHeap, [0.3, 0.1, 0.4, 0.1, 0.5, 0.9, 0.2, 0.6, 0.5, 0.3]),
+    ],
+)
+def test_priority(priority: Any, degrees: list[float]) -> None:
+    """Test priority structures return the same minimums as MinTree."""
+    expect = MinTree(degrees)
+    queue = priority(degrees)
+    step = 1 if priority is BucketQueue else 0.1
+    for _ in range(len(degrees)):
+        idx, val = expect.getMin()
+        assert queue.getMin() == (idx, val)
+
+        neighbors = [j for j in range(len(degrees)) if j % 3 == idx % 3]
+        expect.changeVals(neighbors, [-step] * len(neighbors))
+        queue.changeVals(neighbors, [-step] * len(neighbors))
+        expect.changeVal(idx, float("inf"))
+        queue.changeVal(idx, float("inf"))
+    assert queue.getMin() == (-1, float("inf"))
@@ -0,0 +1,130 @@
+#
+#  test_parallel.py
+#
+#  Copyright (c) 2016-2025 Junpei Kawamoto
+#
+#  This file is part of rgmining-fraudar.
+#
+#  rgmining-fraudar is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  rgmining-fraudar is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with rgmining-fraudar. If not, see <http://www.gnu.org/licenses/>.
+#
+from typing import Any
+
+import numpy as np
+import pytest
+from numpy.testing import assert_almost_equal, assert_array_equal
+from pytest_mock import MockerFixture
+from scipy import sparse
+
+from fraudar import parallel
+from fraudar.export import greedy
+
+
+def _block_diagonal() -> sparse.csr_matrix:
+    """Returns a matrix with three components and an isolated row.
+
+    Rows 0-2 and columns 0-2 are a complete block, rows 3-4 and columns 3-4
+    are a sparser block, and row 6 and column 5 are a single edge.
+    """
+    M = sparse.lil_matrix((7, 6))
+    M[0:3, 0:3] = 1
+    M[3, 3] = M[3, 4] = M[4, 4] = 1
+    M[6, 5] = 1
+    return M.tocsr()
+
+
+def test_components() -> None:
+    """Test components are found in descending order of their sizes."""
+    res = parallel.components(_block_diagonal())
+
+    assert len(res) == 3
+    for (rows, cols), (expect_rows, expect_cols) in zip(
+        res, [([0, 1, 2], [0, 1, 2]), ([3, 4], [3, 4]), ([6], [5])]
+    ):
+        assert_array_equal(rows, expect_rows)
+        assert_array_equal(cols, expect_cols)
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_detect_components(
+    processes: int, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test the top blocks of all components are merged by their scores."""
+    monkeypatch.setattr(parallel, "BATCH_EDGES", 2)
+    M = _block_diagonal()
+    node_susp = (np.zeros(7), np.zeros(6))
+
+    res = parallel.detect_components(
+        M, greedy.aveDegree, 2, processes, node_susp
+    )
+
+    expect = []
+    for rows, cols in ([0, 1, 2], [0, 1, 2]), ([3, 4], [3, 4]), ([6], [5]):
+        sub = M[rows][:, cols]
+        for (row_set, col_set), score in greedy.detectMultiple(
+            sub, greedy.aveDegree, 2
+        ):
+            expect.append(
+                (
+                    (
+                        {rows[i] for i in row_set},
+                        {cols[j] for j in col_set},
+                    ),
+                    score,
+                )
+            )
+    expect.sort(key=lambda b: b[1], reverse=True)
+    assert res == expect[:2]
+    assert res[0] == (({0, 1, 2}, {0, 1, 2}), 1.5)
+
+
+def test_detect_components_empty() -> None:
+    """Test a matrix without edges has no blocks."""
+    assert (
+        parallel.detect_components(
+            sparse.csr_matrix((3, 2)), greedy.aveDegree, 1
+        )
+        == []
+    )
+
+
+def test_detect_together(mocker: MockerFixture) -> None:
+    """Test many small components are detected by one peeling per block."""
+    rng = np.random.default_rng(0)
+    rows = []
+    cols = []
+    for k in range(300):
+        size = rng.integers(1, 5)
+        cells = rng.choice(size * size, rng.integers(1, size * size + 1))
+        rows.append(5 * k + cells // size)
+        cols.append(5 * k + cells % size)
+    M = greedy.listToSparseMatrix(
+        np.concatenate(rows), np.concatenate(cols), (1500, 1500)
+    )
+    comps = parallel.components(M)
+    node_susp = (rng.random(1500), rng.random(1500))
+
+    spy = mocker.spy(greedy, "fastGreedyDecreasing")
+    res = parallel.detect_components(
+        M, greedy.aveDegree, 3, processes=1, node_susp=node_susp
+    )
+    assert spy.call_count == 3
+
+    # a function without the trace argument runs on each component.
+    def algo(M: Any, node_susp: Any) -> Any:
+        return greedy.aveDegree(M, node_susp)
+
+    expect = parallel.detect_each(M, algo, 3, comps, node_susp)
+    assert spy.call_count == 3 + 3 * len(comps)
+    assert [b[0] for b in res] == [b[0] for b in expect]
+    assert_almost_equal([b[1] for b in res], [b[1] for b in expect])
@@ -45,3 +45,43 @@ def test_summary(review_graph: ReviewGraph) -> None:
         review_graph.products[2].summary,
         np.mean(list(review_graph.reviews[review_graph.products[2]].values())),
     )
+
+
+def test_summaries(review_graph: ReviewGraph) -> None:
+    """Test summaries are the weighted averages of the latest ratings."""
+    review_graph.reviewers[0].anomalous_score = 0.5
+    review_graph.add_review(
+        review_graph.reviewers[1], review_graph.products[0], 0.25
+    )
+    review_graph.new_product("product-new")
+
+    res = review_graph.summaries()
+    assert len(res) == len(review_graph.products)
+    reviews = review_graph.reviews
+    for p in review_graph.products[:-1]:
+        weights = [1 - r.anomalous_score for r in reviews[p]]
+        assert_almost_equal(
+            res[p.node_id],
+            np.average(list(reviews[p].values()), weights=weights),
+        )
+    assert np.isnan(res[-1])
+
+
+def test_summaries_cache(review_graph: ReviewGraph) -> None:
+    """Test cached summaries are invalidated when the graph changes."""
+    res = review_graph.summaries()
+    assert review_graph.summaries() is res
+    assert not res.flags.writeable
+
+    review_graph.add_review(
+        review_graph.reviewers[0], review_graph.products[0], 0.0
+    )
+    assert review_graph.summaries() is not res
+
+    res = review_graph.summaries()
+    review_graph.update()
+    assert review_graph.summaries() is not res
+
+    res = review_graph.summaries()
+    review_graph.reviewers[1].anomalous_score = 0.5
+    assert review_graph.summaries() is not res
@@ -19,13 +19,20 @@
 #  along with rgmining-fraudar. If not, see <http://www.gnu.org/licenses/>.
 #
 from collections import defaultdict
+from functools import partial
 from io import StringIO
 from random import random
+from typing import Any, Literal
 
+import numpy as np
 import pytest
+from numpy.testing import assert_array_almost_equal
+from pytest_mock import MockerFixture
 
-from fraudar import ReviewGraph
+from fraudar import ReviewGraph, aveDegree, logWeightedAveDegree, parallel
+from fraudar.export import greedy
 from fraudar.graph import Product, Reviewer
+from fraudar.weighting import rating_deviation
 
 
 def test_new_reviewer(review_graph: ReviewGraph) -> None:
@@ -113,3 +120,485 @@ def test_store_matrix() -> None:
 def test_update(review_graph: ReviewGraph) -> None:
     """Test update method doesn't raise any errors."""
     review_graph.update()
+
+
+def test_update_dump(review_graph: ReviewGraph) -> None:
+    """Test update method writes the edge list when dump is given."""
+    buf = StringIO()
+    review_graph.update(dump=buf)
+
+    edges = [
+        tuple(int(s) for s in line.split(" "))
+        for line in buf.getvalue().splitlines()
+    ]
+    assert len(edges) == 5
+    for i, j in edges:
+        r = review_graph.reviewers[i]
+        p = review_graph.products[j]
+        assert r in review_graph.reviews[p]
+
+
+def test_node_ids(review_graph: ReviewGraph) -> None:
+    """Test nodes get dense IDs aligned with the node lists."""
+    for i, r in enumerate(review_graph.reviewers):
+        assert r.node_id == i
+    for j, p in enumerate(review_graph.products):
+        assert p.node_id == j
+
+
+def test_detect_all(review_graph: ReviewGraph) -> None:
+    """Test detect_all returns the results of each configuration."""
+    configs = [(aveDegree, 1), (logWeightedAveDegree, 2)]
+    res = review_graph.detect_all(configs, processes=2)
+
+    M = review_graph.edges.csr(
+        (len(review_graph.reviewers), len(review_graph.products))
+    )
+    assert res == [
+        greedy.detectMultiple(M, algo, blocks) for algo, blocks in configs
+    ]
+
+
+def test_incremental_update(mocker: MockerFixture) -> None:
+    """Test incremental update re-detects only around added reviews."""
+    graph = ReviewGraph(incremental=True, max_change=0.1)
+    reviewers = [graph.new_reviewer(f"reviewer-{i}") for i in range(40)]
+    products = [graph.new_product(f"product-{i}") for i in range(40)]
+    for i, r in enumerate(reviewers):
+        graph.add_review(r, products[i], 1)
+    for r in reviewers[:5]:
+        for p in products[30:]:
+            graph.add_review(r, p, 1)
+
+    spy = mocker.spy(graph, "_detect_incrementally")
+    graph.update()
+    spy.assert_not_called()
+    assert {r.name for r in reviewers if r.anomalous_score} == {
+        f"reviewer-{i}" for i in range(5)
+    }
+
+    # A small change is handled incrementally.
+    for p in products[30:]:
+        graph.add_review(reviewers[5], p, 1)
+    graph.update()
+    spy.assert_called_once()
+    assert reviewers[5].anomalous_score == 1
+
+    # A large change runs a full detection.
+    for r in reviewers[10:30]:
+        graph.add_review(r, products[0], 1)
+    graph.update()
+    spy.assert_called_once()
+
+
+def test_from_edges() -> None:
+    """Test from_edges creates nodes lazily from arrays."""
+    graph = ReviewGraph.from_edges(
+        np.array(["r1", "r0", "r1"]),
+        np.array([10, 11, 11]),
+        np.array([0.1, 0.2, 0.3]),
+        blocks=2,
+    )
+    assert len(graph.reviewers) == 2
+    assert len(graph.products) == 2
+    assert graph.edges.times is None
+    assert not graph.reviewers._nodes  # pylint: disable=protected-access
+
+    r0, r1 = graph.reviewers
+    p10, p11 = graph.products
+    assert (r0.name, r1.name, p10.name, p11.name) == ("r0", "r1", "10", "11")
+    assert graph.reviews[p11] == {r0: 0.2, r1: 0.3}
+    assert graph.reviews[p10] == {r1: 0.1}
+
+
+def test_add_reviews(review_graph: ReviewGraph) -> None:
+    """Test add_reviews reuses existing nodes."""
+    review_graph.add_reviews(
+        ["reviewer-1", "reviewer-2"],
+        ["product-0", "product-3"],
+        [1, 2],
+        [5, 6],
+    )
+    assert [r.name for r in review_graph.reviewers] == [
+        "reviewer-0",
+        "reviewer-1",
+        "reviewer-2",
+    ]
+    assert len(review_graph.products) == 4
+    reviews = review_graph.reviews
+    assert reviews[review_graph.products[0]][review_graph.reviewers[1]] == 1
+    assert reviews[review_graph.products[3]][review_graph.reviewers[2]] == 2
+    times = review_graph.edges.times
+    assert times is not None
+    assert times[-2:].tolist() == [5, 6]
+
+
+@pytest.mark.parametrize("module", ["pandas", "pyarrow"])
+def test_add_reviews_table(module: str) -> None:
+    """Test add_reviews accepts a pandas DataFrame and a pyarrow Table."""
+    lib = pytest.importorskip(module)
+    columns = {
+        "reviewer": ["r0", "r1"],
+        "product": ["p0", "p0"],
+        "rating": [0.5, 1.0],
+    }
+    if module == "pandas":
+        table = lib.DataFrame(columns)
+    else:
+        table = lib.table(columns)
+
+    graph = ReviewGraph.from_edges(table)
+    p0 = graph.products[0]
+    assert graph.reviews[p0] == {
+        graph.reviewers[0]: 0.5,
+        graph.reviewers[1]: 1.0,
+    }
+
+
+@pytest.mark.parametrize("kind", ["int", "pandas", "pyarrow"])
+def test_add_reviews_factorized(kind: str) -> None:
+    """Test add_reviews assigns the same IDs to integer and categorical names."""
+    reviewers = [3, 10, 3, 2, 10]
+    products = [7, 7, 1, 1, 20]
+    ratings = [0.1, 0.2, 0.3, 0.4, 0.5]
+    graph = ReviewGraph()
+    graph.add_reviews(["2"], ["99"], [1.0])
+    expect_graph = ReviewGraph()
+    expect_graph.add_reviews(["2"], ["99"], [1.0])
+    expect_graph.add_reviews(
+        [str(r) for r in reviewers], [str(p) for p in products], ratings
+    )
+    columns: dict[str, Any] = {
+        "reviewer": reviewers,
+        "product": products,
+        "rating": ratings,
+    }
+    if kind == "int":
+        graph.add_reviews(np.array(reviewers), np.array(products), ratings)
+    elif kind == "pandas":
+        pd = pytest.importorskip("pandas")
+        # An unused category must not add a node.
+        table = pd.DataFrame(columns).astype(
+            {"reviewer": "category", "product": "category"}
+        )
+        table["product"] = table["product"].cat.add_categories([42])
+        graph.add_reviews(table)
+    else:
+        pa = pytest.importorskip("pyarrow")
+        table = pa.table(columns)
+        table = table.set_column(
+            0, "reviewer", table.column("reviewer").dictionary_encode()
+        )
+        table = table.set_column(
+            1, "product", table.column("product").dictionary_encode()
+        )
+        graph.add_reviews(table)
+
+    assert [r.name for r in graph.reviewers] == [
+        r.name for r in expect_graph.reviewers
+    ]
+    assert [p.name for p in graph.products] == [
+        p.name for p in expect_graph.products
+    ]
+    assert (
+        graph.edges.reviewer_ids.tolist()
+        == expect_graph.edges.reviewer_ids.tolist()
+    )
+    assert (
+        graph.edges.product_ids.tolist()
+        == expect_graph.edges.product_ids.tolist()
+    )
+
+
+def test_add_reviews_without_products() -> None:
+    """Test add_reviews rejects arrays without products."""
+    with pytest.raises(TypeError):
+        ReviewGraph().add_reviews(np.array(["r0"]))
+
+
+def test_weighting(mocker: MockerFixture) -> None:
+    """Test update detects blocks on the weighted adjacency matrix."""
+    graph = ReviewGraph.from_edges(
+        np.array([0, 1, 2, 0]),
+        np.array([0, 0, 0, 1]),
+        np.array([1.0, 0.5, 0.0, 0.3]),
+        weighting=rating_deviation,
+    )
+    spy = mocker.spy(greedy, "detectMultiple")
+    graph.update()
+
+    M = spy.call_args.args[0]
+    assert_array_almost_equal(
+        M.toarray(), [[1.5, 1.0], [1.0, 0.0], [1.5, 0.0]]
+    )
+
+
+def test_set_priors(review_graph: ReviewGraph, mocker: MockerFixture) -> None:
+    """Test priors are padded to every node and passed to detection."""
+    with pytest.raises(ValueError):
+        review_graph.set_priors(reviewers=np.ones(3))
+    review_graph.set_priors(reviewers=np.array([0.5]), products=np.ones(3))
+    spy = mocker.spy(greedy, "detectMultiple")
+    review_graph.update()
+
+    node_susp = spy.call_args.args[3]
+    assert_array_almost_equal(node_susp[0], [0.5, 0.0])
+    assert_array_almost_equal(node_susp[1], [1.0, 1.0, 1.0])
+
+
+def test_min_degree(mocker: MockerFixture) -> None:
+    """Test pruning detects the same block on a much smaller matrix."""
+    rng = np.random.default_rng(0)
+    reviewers = np.concatenate(
+        [np.arange(20, 2000), np.repeat(np.arange(20), 15)]
+    )
+    products = np.concatenate(
+        [rng.integers(0, 300, 1980), np.tile(np.arange(15), 20)]
+    )
+    expect = ReviewGraph.from_edges(
+        reviewers, products, np.ones(len(reviewers))
+    )
+    graph = ReviewGraph.from_edges(
+        reviewers, products, np.ones(len(reviewers)), min_degree=2
+    )
+    spy = mocker.spy(greedy, "detectMultiple")
+    expect.update()
+    graph.update()
+
+    assert spy.call_args_list[1].args[0].shape[0] < 0.1 * len(graph.reviewers)
+    assert [r.anomalous_score for r in graph.reviewers] == [
+        r.anomalous_score for r in expect.reviewers
+    ]
+    detected = {r.name for r in graph.reviewers if r.anomalous_score}
+    assert detected == {str(i) for i in range(20)}
+
+
+def test_partition(mocker: MockerFixture) -> None:
+    """Test partitioned detection finds the same block."""
+    reviewers = np.concatenate(
+        [np.arange(20, 200), np.repeat(np.arange(20), 15)]
+    )
+    products = np.concatenate(
+        [np.arange(100, 280), np.tile(np.arange(15), 20)]
+    )
+    expect = ReviewGraph.from_edges(
+        reviewers, products, np.ones(len(reviewers))
+    )
+    graph = ReviewGraph.from_edges(
+        reviewers, products, np.ones(len(reviewers)), partition=True
+    )
+    spy = mocker.spy(parallel, "detect_components")
+    expect.update()
+    graph.update()
+
+    spy.assert_called_once()
+    assert [r.anomalous_score for r in graph.reviewers] == [
+        r.anomalous_score for r in expect.reviewers
+    ]
+
+
+def test_update_unchanged(mocker: MockerFixture) -> None:
+    """Test update reuses the previous result until the graph changes."""
+    graph = ReviewGraph.from_edges(
+        np.array([0, 1, 2, 0]), np.array([0, 0, 1, 1]), np.ones(4)
+    )
+    spy = mocker.spy(greedy, "detectMultiple")
+    graph.update()
+    graph.update()
+    spy.assert_called_once()
+
+    graph.set_priors(reviewers=np.ones(3))
+    graph.update()
+    assert spy.call_count == 2
+
+    graph.add_reviews(np.array([3, 1]), np.array([2, 1]), np.ones(2))
+    graph.update()
+    assert spy.call_count == 3
+
+
+def test_matrix_append() -> None:
+    """Test the cached matrix equals the matrix built from every review."""
+    rng = np.random.default_rng(0)
+    graph = ReviewGraph()
+    for size in (50, 1, 0, 30):
+        graph.add_reviews(
+            rng.integers(0, 20, size), rng.integers(0, 10, size), np.ones(size)
+        )
+        M = graph._matrix()  # pylint: disable=protected-access
+        expect = graph.edges.csr((len(graph.reviewers), len(graph.products)))
+        assert M.shape == expect.shape
+        assert (M != expect).nnz == 0
+        assert M.max() == 1
+
+
+def test_anomalous_scores(review_graph: ReviewGraph) -> None:
+    """Test anomalous scores are one array shared with reviewers."""
+    scores = review_graph.anomalous_scores()
+    assert scores.tolist() == [0, 0]
+    assert not scores.flags.writeable
+
+    review_graph.reviewers[1].anomalous_score = 0.5
+    assert scores.tolist() == [0, 0.5]
+
+    r = review_graph.new_reviewer("reviewer-new", anomalous_score=0.25)
+    review_graph.add_reviews(
+        np.array(["r0", "r1"]), np.array(["p", "p"]), [1, 1]
+    )
+    scores = review_graph.anomalous_scores()
+    assert scores.tolist() == [0, 0.5, 0.25, 0, 0]
+    assert r.anomalous_score == 0.25
+
+    review_graph.update()
+    assert scores.tolist() == [
+        r.anomalous_score for r in review_graph.reviewers
+    ]
+    assert 1 in scores
+
+
+def test_detached_reviewer(review_graph: ReviewGraph) -> None:
+    """Test a reviewer not created by the graph keeps its own score."""
+    r = Reviewer(review_graph, "detached", 0.7)
+    assert r.anomalous_score == 0.7
+    assert review_graph.reviewers[0].anomalous_score == 0
+
+    r.anomalous_score = 0.3
+    assert r.anomalous_score == 0.3
+    assert review_graph.anomalous_scores().tolist() == [0, 0]
+
+
+@pytest.mark.parametrize("kind", ["pandas", "arrow"])
+def test_anomalous_scores_table(
+    review_graph: ReviewGraph, kind: Literal["pandas", "arrow"]
+) -> None:
+    """Test anomalous scores are exported as a column without copying."""
+    pytest.importorskip("pandas" if kind == "pandas" else "pyarrow")
+    review_graph.reviewers[0].anomalous_score = 1
+    res = review_graph.anomalous_scores(kind)
+    assert res.to_numpy().tolist() == [1, 0]
+    assert np.shares_memory(res.to_numpy(), review_graph.anomalous_scores())
+
+
+def test_anomalous_scores_unknown_kind(review_graph: ReviewGraph) -> None:
+    """Test anomalous_scores rejects unknown kinds."""
+    with pytest.raises(ValueError):
+        review_graph.anomalous_scores("list")  # type: ignore[arg-type]
+
+
+def test_graded() -> None:
+    """Test suspiciousness ranks the detected block first."""
+    rng = np.random.default_rng(0)
+    reviewers = np.concatenate(
+        [np.arange(20, 500), np.repeat(np.arange(20), 15)]
+    )
+    products = np.concatenate(
+        [rng.integers(0, 100, 480), np.tile(np.arange(15), 20)]
+    )
+    graph = ReviewGraph.from_edges(
+        reviewers, products, np.ones(len(reviewers)), blocks=2, graded=True
+    )
+    graph.update()
+    graph.new_reviewer("reviewer-new")
+
+    reviewer_scores, product_scores = graph.suspiciousness()
+    assert len(reviewer_scores) == len(graph.reviewers)
+    assert len(product_scores) == len(graph.products)
+    assert reviewer_scores[-1] == 0
+
+    block = {str(i) for i in range(20)}
+    top = graph.most_suspicious(top=20)
+    assert {graph.reviewers[i].name for i in top} == block
+    assert reviewer_scores[top[0]] == reviewer_scores.max()
+    assert np.all(np.diff(reviewer_scores[graph.most_suspicious()]) <= 0)
+
+    threshold = reviewer_scores[top[-1]]
+    res = graph.most_suspicious(threshold=threshold)
+    assert (reviewer_scores[res] >= threshold).all()
+    assert np.count_nonzero(reviewer_scores >= threshold) == len(res)
+
+    top = graph.most_suspicious(top=15, products=True)
+    assert {graph.products[j].name for j in top} == {str(j) for j in range(15)}
+    assert len(graph.most_suspicious(top=0)) == 0
+
+
+def test_graded_pruned() -> None:
+    """Test pruned nodes are the least suspicious."""
+    graph = ReviewGraph.from_edges(
+        np.array([0, 0, 1, 1, 2]),
+        np.array([0, 1, 0, 1, 2]),
+        np.ones(5),
+        min_degree=2,
+        graded=True,
+    )
+    graph.update()
+    reviewer_scores, product_scores = graph.suspiciousness()
+    assert reviewer_scores[0] == reviewer_scores[1] > 0
+    assert reviewer_scores[2] == 0
+    assert product_scores[0] == product_scores[1] > 0
+    assert product_scores[2] == 0
+
+
+def test_graded_errors(review_graph: ReviewGraph) -> None:
+    """Test suspiciousness requires graded without partition."""
+    with pytest.raises(ValueError):
+        review_graph.suspiciousness()
+    with pytest.raises(ValueError):
+        ReviewGraph(graded=True, partition=True)
+
+    def custom(M: Any, node_susp: Any = None) -> Any:
+        return greedy.aveDegree(M, node_susp)
+
+    with pytest.raises(ValueError):
+        ReviewGraph(graded=True, algo=custom)
+    ReviewGraph(graded=True, algo=partial(greedy.aveDegree, engine="python"))
+
+
+def test_incremental_set_priors(mocker: MockerFixture) -> None:
+    """Test setting priors runs a full detection in incremental mode."""
+    reviewers = np.concatenate([np.repeat(np.arange(4), 4), np.arange(20)])
+    products = np.concatenate([np.tile(np.arange(4), 4), np.arange(20)])
+    priors = np.zeros(20)
+    priors[10:15] = 50
+
+    expect = ReviewGraph.from_edges(
+        reviewers, products, np.ones(len(reviewers)), algo=aveDegree
+    )
+    expect.set_priors(reviewers=priors)
+    expect.update()
+
+    graph = ReviewGraph.from_edges(
+        reviewers,
+        products,
+        np.ones(len(reviewers)),
+        algo=aveDegree,
+        incremental=True,
+    )
+    graph.update()
+    spy = mocker.spy(graph, "_detect_incrementally")
+    graph.set_priors(reviewers=priors)
+    graph.update()
+
+    spy.assert_not_called()
+    blocks = graph._last_blocks  # pylint: disable=protected-access
+    assert blocks == expect._last_blocks  # pylint: disable=protected-access
+    assert blocks is not None and blocks[0][0][0] == set(range(10, 15))
+
+
+def test_reviews_view(review_graph: ReviewGraph) -> None:
+    """Test reviews share one index until reviews are added."""
+    reviews = review_graph.reviews
+    index = review_graph._review_index()  # pylint: disable=protected-access
+    assert len(reviews) == 3
+    assert list(reviews) == list(review_graph.products)
+    for p in reviews:
+        reviews[p]
+    assert review_graph._review_index() is index  # pylint: disable=protected-access
+
+    p = review_graph.new_product("product-new")
+    assert reviews[p] == {}
+    r = review_graph.reviewers[0]
+    review_graph.add_review(r, p, 0.5)
+    assert reviews[p] == {r: 0.5}
+    assert review_graph._review_index() is not index  # pylint: disable=protected-access
+
+    with pytest.raises(KeyError):
+        reviews[ReviewGraph().new_product("other")]
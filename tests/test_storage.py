@@ -0,0 +1,69 @@
+#
+#  test_storage.py
+#
+#  Copyright (c) 2016-2025 Junpei Kawamoto
+#
+#  This file is part of rgmining-fraudar.
+#
+#  rgmining-fraudar is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  rgmining-fraudar is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with rgmining-fraudar. If not, see <http://www.gnu.org/licenses/>.
+#
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from fraudar.storage import EdgeStore
+
+
+def test_append() -> None:
+    """Test append grows the arrays and keeps times optional."""
+    store = EdgeStore(capacity=2)
+    for k in range(3000):
+        store.append(k % 7, k % 5, float(k))
+    assert len(store) == 3000
+    assert store.times is None
+    assert_array_equal(store.reviewer_ids, np.arange(3000) % 7)
+    assert_array_equal(store.product_ids, np.arange(3000) % 5)
+    assert_array_equal(store.ratings, np.arange(3000, dtype=float))
+
+    store.append(1, 1, 1.0, 10)
+    store.append(2, 2, 2.0)
+    times = store.times
+    assert times is not None
+    assert np.isnan(times[:3000]).all()
+    assert times[3000] == 10
+    assert np.isnan(times[3001])
+
+
+def test_matrices() -> None:
+    """Test csr and csc build the same 0/1 adjacency matrix."""
+    store = EdgeStore()
+    store.append(0, 1, 0.5)
+    store.append(2, 0, 0.1)
+    store.append(0, 1, 0.7)
+
+    expect = [[0, 1], [0, 0], [1, 0]]
+    assert_array_equal(store.csr((3, 2)).toarray(), expect)
+    assert_array_equal(store.csc((3, 2)).toarray(), expect)
+
+
+def test_weighted_matrices() -> None:
+    """Test weighted matrices keep the weight of the latest edge."""
+    store = EdgeStore()
+    store.append(0, 1, 0.5)
+    store.append(2, 0, 0.1)
+    store.append(0, 1, 0.7)
+    weights = np.array([2.0, 3.0, 4.0])
+
+    expect = [[0, 4], [0, 0], [3, 0]]
+    assert_array_equal(store.csr((3, 2), weights).toarray(), expect)
+    assert_array_equal(store.csc((3, 2), weights).toarray(), expect)
@@ -0,0 +1,61 @@
+#
+#  test_weighting.py
+#
+#  Copyright (c) 2016-2025 Junpei Kawamoto
+#
+#  This file is part of rgmining-fraudar.
+#
+#  rgmining-fraudar is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  rgmining-fraudar is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with rgmining-fraudar. If not, see <http://www.gnu.org/licenses/>.
+#
+import numpy as np
+from numpy.testing import assert_array_almost_equal, assert_array_equal
+
+from fraudar.storage import EdgeStore
+from fraudar.weighting import rating_deviation, time_burst
+
+
+def test_rating_deviation() -> None:
+    """Test weights are one plus the deviation from the product mean."""
+    store = EdgeStore()
+    store.extend(
+        np.array([0, 1, 2, 0]),
+        np.array([0, 0, 0, 1]),
+        np.array([1.0, 0.5, 0.0, 0.3]),
+    )
+    assert_array_almost_equal(rating_deviation(store), [1.5, 1.0, 1.5, 1.0])
+
+
+def test_time_burst() -> None:
+    """Test weights count reviews of the same product in the window."""
+    rng = np.random.default_rng(0)
+    products = rng.integers(0, 5, 300)
+    times = rng.integers(0, 1000, 300).astype(float)
+    times[::7] = np.nan
+    store = EdgeStore()
+    store.extend(np.zeros(300, dtype=np.int64), products, np.ones(300), times)
+
+    expect = [
+        1
+        if np.isnan(t)
+        else np.count_nonzero((products == p) & (np.abs(times - t) <= 30))
+        for p, t in zip(products, times, strict=True)
+    ]
+    assert_array_equal(time_burst(store, window=30), expect)
+
+
+def test_time_burst_without_times() -> None:
+    """Test every edge is weighted one without times."""
+    store = EdgeStore()
+    store.extend(np.array([0, 1]), np.array([0, 0]), np.ones(2))
+    assert_array_equal(time_burst(store), [1, 1])